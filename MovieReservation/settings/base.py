@@ -20,9 +20,11 @@ INSTALLED_APPS = [
     # My apps
     'apps.account_app.apps.AccountAppConfig',
     'apps.movie_app.apps.MovieAppConfig',
+    'apps.analytics_app.apps.AnalyticsAppConfig',
 ]
 
 MIDDLEWARE = [
+    'utils.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -67,6 +69,11 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Logins and registrations hash passwords on a bounded pool per process, requests beyond
+# workers + queue size are answered with a 429 instead of waiting
+PASSWORD_HASHING_WORKERS = os.cpu_count() or 1
+PASSWORD_HASHING_QUEUE_SIZE = 4 * PASSWORD_HASHING_WORKERS
+
 
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -77,11 +84,54 @@ STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = 'media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Absolute base URL media is served from (e.g. a CDN), poster URLs are built against the request host when unset
+MEDIA_BASE_URL = os.environ.get('MEDIA_BASE_URL')
+# Widths of the resized poster copies (JPEG and WebP) generated on upload, and the workers generating them
+POSTER_RENDITION_WIDTHS = {'thumbnail': 160, 'medium': 480}
+POSTER_RENDITION_WORKERS = 2
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'account_app.CustomUser'
 
+# Local memory cache is per process, point this to a shared backend (e.g. Redis) when running several workers
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# How bookings claim seat rows: 'optimistic' with a conditional UPDATE, or 'pessimistic' with row locks
+# (SELECT ... FOR UPDATE SKIP LOCKED) that report seats other bookings are working on without waiting for them
+SEAT_LOCKING = 'optimistic'
+
+# Showtimes with this many available seats or less are shown as having few seats left
+FEW_SEATS_LEFT = 10
+
+# How long a seat stays held for a user before it is released back, in seconds
+SEAT_HOLD_TTL = 10 * 60
+
+# Upper bound on how long a showtime's available seats payload is served from cache, in seconds
+SEAT_AVAILABILITY_CACHE_TIMEOUT = 5 * 60
+
+# How long catalogue responses (movies, genres, schedules) are cached, they are invalidated on change anyway
+CATALOGUE_CACHE_TIMEOUT = 60 * 60
+
+# Rows fetched from the database and written out at a time by the streaming reservation exports
+EXPORT_CHUNK_SIZE = 2000
+
+# Days of the sales rollup are aggregated again from this long before the last refresh, in seconds,
+# so reservations that were still being committed while it ran are picked up
+ANALYTICS_SETTLE_TIME = 5 * 60
+
+# Addresses allowed to scrape the request metrics at /internal/metrics/
+INTERNAL_IPS = os.environ.get('INTERNAL_IPS', '127.0.0.1').split(',')
+# Requests slower than this are logged with their most frequent queries, in seconds
+SLOW_REQUEST_THRESHOLD = 1.0
+
+# Broker that fans live seat changes out to the SSE listeners of each process
+SEAT_EVENTS_BROKER = 'apps.movie_app.events.InMemoryBroker'
+
 from .rest_settings import *
 
 from .jazzmin_settings import *
@@ -5,3 +5,6 @@ class AccountAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.account_app'
     verbose_name = 'accounts'
+
+    def ready(self):
+        from . import signals, schema  # noqa: F401
@@ -0,0 +1,63 @@
+"""
+ASGI-native login and registration, mounted under ``/api/account/async/auth/``.
+
+They take the same JSON bodies and return the same payloads as their DRF counterparts, but await the
+password hashing pool instead of blocking a worker thread on it, so a login storm only costs suspended
+coroutines while the pool works through its queue.
+"""
+import json
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import serializers
+from .hashing import HashingPoolSaturated
+from .serializer import AsyncUserLoginSerializer, UserRegisterSerializer, UserSerializer
+from .utils import get_tokens, too_many_requests
+
+
+def _json_body(request):
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _authenticated(user, status):
+    return JsonResponse({**get_tokens(user=user), 'user': UserSerializer(user).data}, status=status)
+
+
+@csrf_exempt
+@require_POST
+async def login(request):
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({'error': 'Expected a JSON object'}, status=400)
+    serializer = AsyncUserLoginSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+    try:
+        user = await serializer.alogin()
+    except HashingPoolSaturated:
+        return too_many_requests(JsonResponse)
+    except serializers.ValidationError as e:
+        return JsonResponse({'non_field_errors': e.detail}, status=400)
+    return _authenticated(user, status=200)
+
+
+@csrf_exempt
+@require_POST
+async def register(request):
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({'error': 'Expected a JSON object'}, status=400)
+    serializer = UserRegisterSerializer(data=data)
+    # The unique phone and email checks query the database, the hashing below is what takes long
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=400)
+    try:
+        user = await serializer.acreate()
+    except HashingPoolSaturated:
+        return too_many_requests(JsonResponse)
+    return _authenticated(user, status=201)
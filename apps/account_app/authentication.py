@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .models import CustomUser
+
+# Everything permission checks and serializers of authenticated requests need, the rest is loaded lazily
+CACHED_USER_FIELDS = ('id', 'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser')
+
+
+def user_cache_key(user_id) -> str:
+    return f'account:auth-user:{user_id}'
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that resolves the user from a short lived cache entry instead of querying
+    ``CustomUser`` on every request. The entry is dropped whenever the user is saved or deleted, so
+    deactivating a user or changing their password takes effect on the next request.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        key = user_cache_key(user_id)
+        values = cache.get(key)
+        if values is None:
+            user = CustomUser.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).only(
+                *CACHED_USER_FIELDS, 'password'
+            ).first()
+            if user is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            values = {field: getattr(user, field) for field in CACHED_USER_FIELDS}
+            values['password_hash'] = get_md5_hash_password(user.password)
+            cache.set(key, values, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+
+        if not values['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != values['password_hash']:
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        # A model instance with the remaining fields deferred, so it still works as a foreign key value
+        return CustomUser.from_db(
+            DEFAULT_DB_ALIAS,
+            CACHED_USER_FIELDS,
+            [values[field.attname] for field in CustomUser._meta.concrete_fields if field.attname in values],
+        )
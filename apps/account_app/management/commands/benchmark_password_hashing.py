@@ -0,0 +1,33 @@
+import json
+import os
+import time
+from concurrent.futures import wait
+from django.contrib.auth.hashers import make_password, verify_password
+from django.core.management.base import BaseCommand
+from apps.account_app.hashing import HashingPool
+
+
+class Command(BaseCommand):
+    help = 'Measure password checks per second (i.e. login throughput) of the hashing pool for several pool sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, nargs='+', help='Pool sizes to measure, defaults to 1 and every core')
+        parser.add_argument('--checks', type=int, default=200, help='Password checks per pool size')
+
+    def handle(self, *args, **options):
+        cores = os.cpu_count() or 1
+        encoded = make_password('password123')
+        results = []
+        for workers in options['workers'] or sorted({1, cores}):
+            pool = HashingPool(workers=workers, queue_size=options['checks'])
+            started = time.perf_counter()
+            wait([pool.submit(verify_password, 'password123', encoded) for _ in range(options['checks'])])
+            elapsed = time.perf_counter() - started
+            results.append({
+                'workers': workers,
+                'checks': options['checks'],
+                'seconds': round(elapsed, 3),
+                'checks_per_second': round(options['checks'] / elapsed, 1),
+                'checks_per_second_per_core': round(options['checks'] / elapsed / min(workers, cores), 1),
+            })
+        self.stdout.write(json.dumps({'cores': cores, 'results': results}, indent=2))
@@ -1,7 +1,8 @@
 from rest_framework import serializers
 from .models import CustomUser
-from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import verify_password
 from .utils import validate_and_format_phone
+from .hashing import hashing_pool
 
 
 class BaseUserSerializer(serializers.ModelSerializer):
@@ -56,14 +57,26 @@ class UserRegisterSerializer(BaseUserSerializer):
         }
 
     def create(self, validated_data):
-        user = CustomUser.objects.create_user(
+        user = self._build_user(validated_data)
+        hashing_pool.run(user.set_password, validated_data['password'])
+        user.save()
+        return user
+
+    async def acreate(self):
+        """Like ``save()``, but the event loop is free while the password is hashed."""
+        user = self._build_user(self.validated_data)
+        await hashing_pool.arun(user.set_password, self.validated_data['password'])
+        await user.asave()
+        return user
+
+    @staticmethod
+    def _build_user(validated_data):
+        return CustomUser(
             first_name=validated_data['first_name'],
             last_name=validated_data['last_name'],
             phone=validated_data['phone'],
-            email=validated_data['email'],
-            password=validated_data['password'],
+            email=CustomUser.objects.normalize_email(validated_data['email']),
         )
-        return user
 
     def validate_phone(self, value):
         return super().validate_phone(value)
@@ -100,14 +113,48 @@ class UserLoginSerializer(serializers.Serializer):
         return phone
 
     def validate(self, data):
-        allowed_fields = set(self.fields)
-        received_fields = set(self.initial_data.keys())
-        invalid_fields = received_fields - allowed_fields
+        self._check_invalid_fields()
+        user = self._users(data).first()
+        is_correct, must_update = hashing_pool.run(*self._verification(data, user))
+        self._check_login(user, is_correct)
+        if must_update:
+            hashing_pool.run(user.set_password, data['password'])
+            user.save(update_fields=['password'])
+        return user
+
+    def _check_invalid_fields(self):
+        invalid_fields = set(self.initial_data.keys()) - set(self.fields)
         if invalid_fields:
             raise serializers.ValidationError(f"Invalid fields: {', '.join(invalid_fields)}")
 
-        user = authenticate(phone=data['phone'], password=data['password'])
-        if user is None:
+    @staticmethod
+    def _users(data):
+        return CustomUser.objects.filter(phone=data['phone'])
+
+    @staticmethod
+    def _verification(data, user):
+        # Hash even when there is no such user, so response times don't reveal registered phones
+        return verify_password, data['password'], user.password if user else ''
+
+    @staticmethod
+    def _check_login(user, is_correct):
+        if not is_correct or not user.is_active:
             raise serializers.ValidationError("Invalid phone or password")
 
+
+class AsyncUserLoginSerializer(UserLoginSerializer):
+    """Validating only checks the fields, ``alogin()`` then checks the password without blocking the event loop."""
+
+    def validate(self, data):
+        self._check_invalid_fields()
+        return data
+
+    async def alogin(self) -> CustomUser:
+        data = self.validated_data
+        user = await self._users(data).afirst()
+        is_correct, must_update = await hashing_pool.arun(*self._verification(data, user))
+        self._check_login(user, is_correct)
+        if must_update:
+            await hashing_pool.arun(user.set_password, data['password'])
+            await user.asave(update_fields=['password'])
         return user
@@ -1,3 +1,138 @@
-from django.test import TestCase
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.cache import cache
+from django.test import AsyncClient, RequestFactory, TestCase
+from rest_framework.test import APITestCase
+from .authentication import CachedJWTAuthentication
+from .hashing import HashingPoolSaturated, hashing_pool
+from .models import CustomUser
+from .utils import get_tokens
 
-# Create your tests here.
+
+class AsyncAuthenticationTests(TestCase):
+    def setUp(self):
+        self.client = AsyncClient()
+
+    def post(self, path, data):
+        return async_to_sync(self.client.post)(path, data, content_type='application/json')
+
+    def test_register_then_login(self):
+        response = self.post('/api/account/async/auth/register/', {
+            'first_name': 'Test', 'last_name': 'User', 'email': 'test@example.com', 'phone': '09120000001',
+            'password': 'pass12345', 'confirm_password': 'pass12345',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(CustomUser.objects.get(phone='09120000001').check_password('pass12345'))
+
+        response = self.post('/api/account/async/auth/login/', {'phone': '09120000001', 'password': 'pass12345'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.json())
+        self.assertEqual(response.json()['user']['phone'], '09120000001')
+
+    def test_login_with_wrong_password(self):
+        CustomUser.objects.create_user(
+            first_name='Test', last_name='User', phone='09120000001', email='test@example.com', password='pass12345'
+        )
+        response = self.post('/api/account/async/auth/login/', {'phone': '09120000001', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('access', response.json())
+
+    def test_register_rejects_taken_phone(self):
+        CustomUser.objects.create_user(
+            first_name='Test', last_name='User', phone='09120000001', email='test@example.com', password='pass12345'
+        )
+        response = self.post('/api/account/async/auth/register/', {
+            'first_name': 'Other', 'last_name': 'User', 'email': 'other@example.com', 'phone': '09120000001',
+            'password': 'pass12345', 'confirm_password': 'pass12345',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('phone', response.json())
+
+
+class LoginParityTests(TestCase):
+    """The DRF and the async login answer alike."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            first_name='Test', last_name='User', phone='09120000001', email='test@example.com', password='pass12345'
+        )
+
+    def login(self, data):
+        sync_response = self.client.post('/api/account/auth/login/', data, content_type='application/json')
+        async_response = async_to_sync(AsyncClient().post)(
+            '/api/account/async/auth/login/', data, content_type='application/json'
+        )
+        self.assertEqual(sync_response.status_code, async_response.status_code)
+        return sync_response, async_response
+
+    def test_rejects_unknown_fields(self):
+        for response in self.login({'phone': '09120000001', 'password': 'pass12345', 'is_staff': True}):
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'non_field_errors': ['Invalid fields: is_staff']})
+
+    def test_rejects_inactive_user(self):
+        CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        for response in self.login({'phone': '09120000001', 'password': 'pass12345'}):
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'non_field_errors': ['Invalid phone or password']})
+
+    def test_saturated_pool_is_too_many_requests(self):
+        with mock.patch.object(hashing_pool, 'submit', side_effect=HashingPoolSaturated):
+            responses = self.login({'phone': '09120000001', 'password': 'pass12345'})
+        for response in responses:
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response['Retry-After'], '1')
+            self.assertEqual(response.json(), {'error': 'Too many requests, please try again in a moment'})
+
+    def test_rehashes_outdated_password(self):
+        hasher = PBKDF2PasswordHasher()
+        for path in ('/api/account/auth/login/', '/api/account/async/auth/login/'):
+            outdated = hasher.encode('pass12345', hasher.salt(), iterations=1000)
+            CustomUser.objects.filter(pk=self.user.pk).update(password=outdated)
+            response = async_to_sync(AsyncClient().post)(
+                path, {'phone': '09120000001', 'password': 'pass12345'}, content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 200)
+            self.user.refresh_from_db()
+            self.assertFalse(hasher.must_update(self.user.password))
+            self.assertTrue(self.user.check_password('pass12345'))
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            first_name='Test', last_name='User', phone='09120000001', email='test@example.com', password='pass12345'
+        )
+        self.access = get_tokens(self.user)['access']
+
+    def authenticate(self):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        user, _ = CachedJWTAuthentication().authenticate(request)
+        return user
+
+    def test_cache_hit_runs_no_query(self):
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertEqual((user.pk, user.first_name, user.is_active), (self.user.pk, 'Test', True))
+
+    def test_saving_the_user_invalidates_the_entry(self):
+        self.authenticate()
+        self.user.first_name = 'Other'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.authenticate().first_name, 'Other')
+
+    def test_deactivated_user_is_unauthorized(self):
+        # Staff may list reservations, so the first request is allowed
+        CustomUser.objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        self.assertEqual(self.client.get('/api/movie/reservation/').status_code, 200)
+        self.user.is_staff, self.user.is_active = True, False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.client.get('/api/movie/reservation/').status_code, 401)
@@ -1,5 +1,6 @@
-from . import views
+from . import views, async_views
 from rest_framework.routers import SimpleRouter
+from django.urls import path
 
 app_name = 'account'
 
@@ -7,4 +8,7 @@ router = SimpleRouter()
 router.register('auth', views.UserAuthenticationViewSet, basename='auth')
 router.register('users', views.UserViewSet, basename='users')
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    path('async/auth/login/', async_views.login, name='async_login'),
+    path('async/auth/register/', async_views.register, name='async_register'),
+]
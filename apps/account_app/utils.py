@@ -1,16 +1,24 @@
 from .models import CustomUser
-from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
+from rest_framework_simplejwt.tokens import RefreshToken
 
 
 def get_tokens(user: CustomUser) -> dict[str, str]:
-    access = AccessToken.for_user(user=user)
     refresh = RefreshToken.for_user(user=user)
+    # Derived from the refresh token instead of building and signing the user claims a second time
+    access = refresh.access_token
     return {
         'refresh': str(refresh),
         'access': str(access),
     }
 
 
+def too_many_requests(response_class):
+    """Answer a request refused by the saturated hashing pool, with either a DRF ``Response`` or a ``JsonResponse``."""
+    return response_class(
+        {'error': 'Too many requests, please try again in a moment'}, status=429, headers={'Retry-After': '1'}
+    )
+
+
 def validate_and_format_phone(phone_number: str) -> str | Exception:
     if len(phone_number) != 11:
         raise Exception('phone number must be 11 character')
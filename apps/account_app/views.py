@@ -8,7 +8,9 @@ from .permissions import UserHasPermissionOrReadOnly
 from rest_framework.permissions import IsAuthenticated
 from drf_spectacular.utils import extend_schema
 from rest_framework_simplejwt.views import TokenRefreshView
-from .utils import get_tokens
+from .utils import get_tokens, too_many_requests
+from .hashing import HashingPoolSaturated
+from utils.pagination import IdCursorPagination
 from . import decorators
 
 
@@ -17,7 +19,11 @@ class UserAuthenticationViewSet(ViewSet):
     @decorators.user_login_decorator
     def login(self, request):
         serializer = UserLoginSerializer(data=request.data)
-        if serializer.is_valid():
+        try:
+            is_valid = serializer.is_valid()
+        except HashingPoolSaturated:
+            return too_many_requests(Response)
+        if is_valid:
             user = serializer.validated_data
             tokens = get_tokens(user=user)
             return Response({
@@ -30,7 +36,10 @@ class UserAuthenticationViewSet(ViewSet):
     def register(self, request):
         serializer = UserRegisterSerializer(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
+            try:
+                user = serializer.save()
+            except HashingPoolSaturated:
+                return too_many_requests(Response)
             tokens = get_tokens(user=user)
             return Response({
                 **tokens,
@@ -46,12 +55,15 @@ class UserAuthenticationViewSet(ViewSet):
 @extend_schema(tags=['User account'])
 class UserViewSet(ViewSet):
     permission_classes = [IsAuthenticated, UserHasPermissionOrReadOnly]
+    pagination_class = IdCursorPagination
 
     @decorators.users_list_decorator
     def list(self, request):
         queryset = CustomUser.objects.all()
-        serializer = UserSerializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = UserSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     @decorators.user_retrieve_decorator
     def retrieve(self, request, pk=None):
@@ -0,0 +1,18 @@
+from django.contrib import admin
+from .models import DailySales
+
+
+class DailySalesAdmin(admin.ModelAdmin):
+    list_display = ('day', 'movie', 'genre', 'show_date', 'reservations', 'seats_sold', 'cancellations')
+    list_filter = ('day', 'genre')
+    search_fields = ('movie__title',)
+    date_hierarchy = 'day'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+admin.site.register(DailySales, DailySalesAdmin)
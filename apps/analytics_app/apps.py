@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class AnalyticsAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.analytics_app'
+    verbose_name = 'analytics'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,62 @@
+from drf_spectacular.utils import OpenApiParameter, OpenApiTypes
+from . import serializer
+from utils.custom_decorator import custom_decorator
+
+DATE_RANGE_PARAMETERS = [
+    OpenApiParameter(
+        name='date_from',
+        type=OpenApiTypes.DATE,
+        required=False,
+        location=OpenApiParameter.QUERY,
+        description='First day of the range, 30 days before date_to by default',
+    ),
+    OpenApiParameter(
+        name='date_to',
+        type=OpenApiTypes.DATE,
+        required=False,
+        location=OpenApiParameter.QUERY,
+        description='Last day of the range, today by default',
+    ),
+]
+
+daily_sales_decorator = custom_decorator(
+    methods=['GET'],
+    url_path='daily',
+    url_name='daily',
+    responses=serializer.DailySalesSerializer(many=True),
+    summary='Sales per day',
+    description='Staff only. Reservations, seats sold and cancellations per day they were made, '
+                'read from the daily rollup which is refreshed periodically',
+    parameters=DATE_RANGE_PARAMETERS,
+)
+
+movie_sales_decorator = custom_decorator(
+    methods=['GET'],
+    url_path='movies',
+    url_name='movies',
+    responses=serializer.MovieSalesSerializer(many=True),
+    summary='Sales per movie',
+    description='Staff only. Sales of the days in the range per movie, best selling first',
+    parameters=DATE_RANGE_PARAMETERS,
+)
+
+genre_sales_decorator = custom_decorator(
+    methods=['GET'],
+    url_path='genres',
+    url_name='genres',
+    responses=serializer.GenreSalesSerializer(many=True),
+    summary='Sales per genre',
+    description='Staff only. Sales of the days in the range per genre, best selling first',
+    parameters=DATE_RANGE_PARAMETERS,
+)
+
+occupancy_decorator = custom_decorator(
+    methods=['GET'],
+    url_path='occupancy',
+    url_name='occupancy',
+    responses=serializer.OccupancySerializer(many=True),
+    summary='Occupancy per showtime date',
+    description='Staff only. Capacity and reserved seats of the showtimes of every date in the range, '
+                'from the seat counters kept on the showtimes',
+    parameters=DATE_RANGE_PARAMETERS,
+)
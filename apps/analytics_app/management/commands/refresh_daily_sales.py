@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from apps.analytics_app.services import refresh_daily_sales
+
+
+class Command(BaseCommand):
+    help = 'Bring the daily sales rollup up to date, meant to be run periodically (e.g. from cron every 15 minutes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Aggregate every reservation again')
+
+    def handle(self, *args, **options):
+        count = refresh_daily_sales(rebuild=options['rebuild'])
+        self.stdout.write(self.style.SUCCESS(f'{count} daily sales rows refreshed.'))
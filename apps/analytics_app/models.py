@@ -0,0 +1,46 @@
+from django.db import models
+from apps.movie_app.models import Movie, MovieGenre
+
+
+class DailySales(models.Model):
+    """
+    Reservations made and cancelled on one day for the showtimes of a movie on one date. The rows are
+    rebuilt by ``refresh_daily_sales``, the sales endpoints read nothing else.
+    """
+    day = models.DateField(help_text='Day the reservations were made or cancelled')
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='daily_sales')
+    genre = models.ForeignKey(MovieGenre, on_delete=models.SET_NULL, null=True, blank=True, related_name='daily_sales')
+    show_date = models.DateField()
+    reservations = models.PositiveIntegerField(default=0)
+    seats_sold = models.PositiveIntegerField(default=0)
+    cancellations = models.PositiveIntegerField(default=0)
+    seats_released = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'daily sales'
+        constraints = [models.UniqueConstraint(fields=['day', 'movie', 'show_date'], name='unique_daily_sales')]
+
+    def __str__(self):
+        return f"{self.movie} on {self.day} for {self.show_date}"
+
+
+class CancelledReservation(models.Model):
+    """Cancelled reservations are deleted, this keeps what the rollups need to count them."""
+    reservation_id = models.BigIntegerField()
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    genre = models.ForeignKey(MovieGenre, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    show_date = models.DateField()
+    seats = models.PositiveIntegerField()
+    reserved_at = models.DateTimeField(db_index=True)
+    cancelled_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Reservation {self.reservation_id} cancelled at {self.cancelled_at}"
+
+
+class RollupCheckpoint(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    position = models.DateTimeField(null=True, blank=True, help_text='Time up to which the rollup is complete')
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,30 @@
+from rest_framework import serializers
+
+
+class SalesTotalsSerializer(serializers.Serializer):
+    reservations = serializers.IntegerField(source='total_reservations')
+    seats_sold = serializers.IntegerField(source='total_seats_sold')
+    cancellations = serializers.IntegerField(source='total_cancellations')
+    seats_released = serializers.IntegerField(source='total_seats_released')
+
+
+class DailySalesSerializer(SalesTotalsSerializer):
+    day = serializers.DateField()
+
+
+class MovieSalesSerializer(SalesTotalsSerializer):
+    movie = serializers.IntegerField()
+    title = serializers.CharField()
+
+
+class GenreSalesSerializer(SalesTotalsSerializer):
+    genre = serializers.IntegerField(allow_null=True)
+    name = serializers.CharField(allow_null=True)
+
+
+class OccupancySerializer(serializers.Serializer):
+    show_date = serializers.DateField()
+    showtimes = serializers.IntegerField()
+    capacity = serializers.IntegerField()
+    reserved = serializers.IntegerField()
+    occupancy = serializers.FloatField(help_text='Share of the seats reserved, from 0 to 1')
@@ -0,0 +1,66 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from apps.movie_app.models import Reservation
+from .models import DailySales, CancelledReservation, RollupCheckpoint
+
+DAILY_SALES = 'daily_sales'
+
+
+def refresh_daily_sales(rebuild: bool = False) -> int:
+    """
+    Bring the daily sales rollup up to date and return the number of rows written.
+
+    Only the days since the last refresh are aggregated again, starting ``ANALYTICS_SETTLE_TIME``
+    before it so reservations that were still being committed at that time are not missed. Those
+    days are replaced as a whole, so running it again is harmless. ``rebuild`` aggregates everything.
+    """
+    RollupCheckpoint.objects.get_or_create(name=DAILY_SALES)
+    now = timezone.now()
+    with transaction.atomic():
+        # Locked, so concurrent refreshes run one after the other
+        checkpoint = RollupCheckpoint.objects.select_for_update().get(name=DAILY_SALES)
+        since = None
+        if checkpoint.position and not rebuild:
+            settled = timezone.localtime(checkpoint.position - timedelta(seconds=settings.ANALYTICS_SETTLE_TIME))
+            since = timezone.make_aware(datetime.combine(settled.date(), time.min))
+
+        bookings = Reservation.objects.filter(created_at__lt=now)
+        booked_cancellations = CancelledReservation.objects.filter(reserved_at__lt=now)
+        cancellations = CancelledReservation.objects.filter(cancelled_at__lt=now)
+        if since:
+            bookings = bookings.filter(created_at__gte=since)
+            booked_cancellations = booked_cancellations.filter(reserved_at__gte=since)
+            cancellations = cancellations.filter(cancelled_at__gte=since)
+
+        rows = defaultdict(lambda: DailySales(reservations=0, seats_sold=0, cancellations=0, seats_released=0))
+
+        def add(queryset, date_field, counts):
+            for values in queryset.order_by().annotate(day=TruncDate(date_field)).values(
+                    'day', 'movie_id', 'show_date', 'genre_id'
+            ).annotate(**counts):
+                row = rows[values['day'], values['movie_id'], values['show_date']]
+                row.genre_id = values['genre_id']
+                for name in counts:
+                    setattr(row, name, getattr(row, name) + values[name])
+
+        # Cancelled reservations still count as sold on the day they were made
+        add(
+            bookings.annotate(show_date=F('showtime__show_date'), genre_id=F('movie__genre_id')),
+            'created_at', {'reservations': Count('id', distinct=True), 'seats_sold': Count('seats')},
+        )
+        add(booked_cancellations, 'reserved_at', {'reservations': Count('id'), 'seats_sold': Sum('seats')})
+        add(cancellations, 'cancelled_at', {'cancellations': Count('id'), 'seats_released': Sum('seats')})
+
+        for (day, movie_id, show_date), row in rows.items():
+            row.day, row.movie_id, row.show_date = day, movie_id, show_date
+        stale = DailySales.objects.all() if since is None else DailySales.objects.filter(day__gte=since.date())
+        stale.delete()
+        DailySales.objects.bulk_create(rows.values(), batch_size=1000)
+        checkpoint.position = now
+        checkpoint.save(update_fields=['position'])
+    return len(rows)
@@ -0,0 +1,18 @@
+from django.db.models import Count
+from django.dispatch import receiver
+from apps.movie_app.models import Reservation
+from apps.movie_app.services import reservations_cancelled
+from .models import CancelledReservation
+
+
+@receiver(reservations_cancelled)
+def log_cancelled_reservations(sender, reservation_ids, **kwargs):
+    CancelledReservation.objects.bulk_create(
+        CancelledReservation(
+            reservation_id=row['id'], movie_id=row['movie_id'], genre_id=row['movie__genre_id'],
+            show_date=row['showtime__show_date'], seats=row['seat_count'], reserved_at=row['created_at'],
+        )
+        for row in Reservation.objects.filter(id__in=reservation_ids).order_by().values(
+            'id', 'movie_id', 'movie__genre_id', 'showtime__show_date', 'created_at'
+        ).annotate(seat_count=Count('seats'))
+    )
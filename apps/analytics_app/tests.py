@@ -0,0 +1,62 @@
+from datetime import date, time
+from django.test import TestCase
+from django.utils import timezone
+from apps.account_app.models import CustomUser
+from apps.movie_app.models import Auditorium, Movie, Reservation, Seat, Showtime
+from apps.movie_app.services import cancel_reservations, create_showtimes, reserve_seats
+from .models import DailySales
+from .services import refresh_daily_sales
+
+
+class RefreshDailySalesTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            first_name='Test', last_name='User', phone='09120000001', email='test@example.com', password='pass12345'
+        )
+        auditorium = Auditorium.objects.create(
+            name='Hall', layout=[{'row': 'A', 'seats': 10, 'seat_class': 'standard'}]
+        )
+        self.movie = Movie.objects.create(title='Movie', duration=120)
+        [self.showtime] = create_showtimes([
+            Showtime(movie=self.movie, auditorium=auditorium, show_date=date(2030, 1, 1), start_time=time(20))
+        ])
+        self.seat_ids = list(Seat.objects.filter(showtime=self.showtime).order_by('id').values_list('id', flat=True))
+
+    def rollup(self):
+        return list(DailySales.objects.order_by('day', 'movie', 'show_date').values(
+            'day', 'movie', 'show_date', 'reservations', 'seats_sold', 'cancellations', 'seats_released'
+        ))
+
+    def expected(self, reservations=0, seats_sold=0, cancellations=0, seats_released=0):
+        return [{
+            'day': timezone.localdate(), 'movie': self.movie.id, 'show_date': date(2030, 1, 1),
+            'reservations': reservations, 'seats_sold': seats_sold,
+            'cancellations': cancellations, 'seats_released': seats_released,
+        }]
+
+    def test_counts_a_booking(self):
+        reserve_seats(self.user, self.showtime, self.seat_ids[:2])
+        self.assertEqual(refresh_daily_sales(), 1)
+        self.assertEqual(self.rollup(), self.expected(reservations=1, seats_sold=2))
+
+    def test_cancelled_booking_still_counts_as_sold(self):
+        reserve_seats(self.user, self.showtime, self.seat_ids[:2])
+        refresh_daily_sales()
+        cancel_reservations(Reservation.objects.all())
+        refresh_daily_sales()
+        self.assertEqual(
+            self.rollup(), self.expected(reservations=1, seats_sold=2, cancellations=1, seats_released=2)
+        )
+
+    def test_running_again_gives_the_same_rollup(self):
+        reserve_seats(self.user, self.showtime, self.seat_ids[:2])
+        cancel_reservations(Reservation.objects.all())
+        reserve_seats(self.user, self.showtime, self.seat_ids[2:5])
+        refresh_daily_sales()
+        rollup = self.rollup()
+        self.assertEqual(rollup, self.expected(reservations=2, seats_sold=5, cancellations=1, seats_released=2))
+
+        refresh_daily_sales()
+        self.assertEqual(self.rollup(), rollup)
+        refresh_daily_sales(rebuild=True)
+        self.assertEqual(self.rollup(), rollup)
@@ -0,0 +1,9 @@
+from . import views
+from rest_framework.routers import SimpleRouter
+
+app_name = 'analytics'
+
+router = SimpleRouter()
+router.register('sales', views.SalesViewSet, basename='sales')
+
+urlpatterns = router.urls
@@ -0,0 +1,84 @@
+from datetime import timedelta
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from drf_spectacular.utils import extend_schema
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.viewsets import ViewSet
+from apps.movie_app.models import Showtime
+from .models import DailySales
+from .serializer import DailySalesSerializer, MovieSalesSerializer, GenreSalesSerializer, OccupancySerializer
+from . import decorators
+
+DEFAULT_RANGE_DAYS = 30
+MAX_RANGE_DAYS = 366
+
+SALES_TOTALS = {
+    'total_reservations': Sum('reservations'),
+    'total_seats_sold': Sum('seats_sold'),
+    'total_cancellations': Sum('cancellations'),
+    'total_seats_released': Sum('seats_released'),
+}
+
+
+class DateRangeError(Exception):
+    pass
+
+
+def date_range(request):
+    try:
+        date_to = parse_date(request.query_params.get('date_to', '')) or timezone.localdate()
+        date_from = (
+            parse_date(request.query_params.get('date_from', '')) or date_to - timedelta(days=DEFAULT_RANGE_DAYS)
+        )
+    except ValueError:
+        raise DateRangeError('date_from and date_to must be dates in the format YYYY-MM-DD')
+    if not 0 <= (date_to - date_from).days <= MAX_RANGE_DAYS:
+        raise DateRangeError(f'date_to must be on or after date_from and at most {MAX_RANGE_DAYS} days later')
+    return date_from, date_to
+
+
+@extend_schema(tags=['Analytics'])
+class SalesViewSet(ViewSet):
+    permission_classes = [IsAdminUser]
+
+    def _sales(self, request, serializer_class, ordering, *fields, **expressions):
+        """Totals of the rollup rows of the requested days, grouped by ``fields`` and ``expressions``."""
+        try:
+            date_from, date_to = date_range(request)
+        except DateRangeError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        rows = DailySales.objects.filter(day__range=(date_from, date_to)).values(
+            *fields, **expressions
+        ).annotate(**SALES_TOTALS).order_by(ordering)
+        return Response(serializer_class(rows, many=True).data, status=status.HTTP_200_OK)
+
+    @decorators.daily_sales_decorator
+    def daily(self, request):
+        return self._sales(request, DailySalesSerializer, 'day', 'day')
+
+    @decorators.movie_sales_decorator
+    def movies(self, request):
+        return self._sales(request, MovieSalesSerializer, '-total_seats_sold', 'movie', title=F('movie__title'))
+
+    @decorators.genre_sales_decorator
+    def genres(self, request):
+        return self._sales(request, GenreSalesSerializer, '-total_seats_sold', 'genre', name=F('genre__name'))
+
+    @decorators.occupancy_decorator
+    def occupancy(self, request):
+        try:
+            date_from, date_to = date_range(request)
+        except DateRangeError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        # Not from the rollups, which have no capacity, the showtimes keep both counters up to date
+        rows = Showtime.objects.filter(show_date__range=(date_from, date_to)).values('show_date').annotate(
+            showtimes=Count('id'), capacity=Sum('capacity'), reserved=Sum('reserved_count'),
+        ).order_by('show_date')
+        data = [
+            {**row, 'occupancy': round(row['reserved'] / row['capacity'], 4) if row['capacity'] else 0.0}
+            for row in rows
+        ]
+        return Response(OccupancySerializer(data, many=True).data, status=status.HTTP_200_OK)
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import MoviePoster, Movie, Showtime, MovieGenre, Seat, Reservation
+from .models import MoviePoster, Movie, Showtime, MovieGenre, Reservation, Auditorium
+from .services import cancel_reservations
 
 
 class MovieGenreAdmin(admin.ModelAdmin):
@@ -29,15 +30,22 @@ class MovieAdmin(admin.ModelAdmin):
     list_filter = ('genre', 'language')
 
 
-class SeatAdmin(admin.StackedInline):
-    model = Seat
-    extra = 0
+class AuditoriumAdmin(admin.ModelAdmin):
+    readonly_fields = ('created_at', 'updated_at', 'capacity')
+    list_display = ('name', 'capacity', 'updated_at')
+    search_fields = ('name',)
 
 
 class ShowTimeAdmin(admin.ModelAdmin):
-    inlines = (SeatAdmin,)
-    list_display = ('movie', 'show_date', 'start_time')
-    list_filter = ('movie', 'show_date')
+    # Seats are created from the auditorium layout, editing them here would bypass the showtime counters
+    list_display = ('movie', 'auditorium', 'show_date', 'start_time')
+    list_filter = ('movie', 'auditorium', 'show_date')
+    actions = ('cancel_all_reservations',)
+
+    @admin.action(description='Cancel all reservations of selected showtimes')
+    def cancel_all_reservations(self, request, queryset):
+        count = cancel_reservations(Reservation.objects.filter(showtime__in=queryset))
+        self.message_user(request, f'{count} reservations canceled.')
 
 
 class ReservationAdmin(admin.ModelAdmin):
@@ -51,3 +59,4 @@ admin.site.register(Movie, MovieAdmin)
 admin.site.register(Showtime, ShowTimeAdmin)
 admin.site.register(Reservation, ReservationAdmin)
 admin.site.register(MovieGenre, MovieGenreAdmin)
+admin.site.register(Auditorium, AuditoriumAdmin)
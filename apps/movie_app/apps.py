@@ -5,3 +5,6 @@ class MovieAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.movie_app'
     verbose_name = 'movie'
+
+    def ready(self):
+        from . import signals  # noqa: F401
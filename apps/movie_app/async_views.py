@@ -0,0 +1,72 @@
+"""
+ASGI-native variants of the busiest read endpoints, mounted under ``/api/movie/async/``.
+
+DRF views are synchronous, so these are plain Django async views that return the same payloads as
+their DRF counterparts and share their cache entries. Under an ASGI server a slow client only
+costs a suspended coroutine instead of a worker thread, and cache hits never leave the event loop.
+"""
+from asgiref.sync import sync_to_async
+from django.db.models import Min
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils import timezone
+from django.utils.http import parse_etags
+from rest_framework.request import Request
+from . import cache
+from .models import MovieGenre, Movie, Showtime, Seat, SeatHold
+from .serializer import MovieGenreSerializer, MovieSerializer, SeatSerializer, MovieFilterSerializer
+from .views import POSTERS_PREFETCH, SHOWTIMES_PREFETCH, build_movie_page
+
+
+async def genre_list(request):
+    async def build():
+        genres = [genre async for genre in MovieGenre.objects.filter(is_active=True)]
+        return MovieGenreSerializer(genres, many=True).data
+
+    data = await cache.acached_catalogue_data(request, 'genre-list', build)
+    return JsonResponse(data, safe=False)
+
+
+async def movie_list(request):
+    filters = MovieFilterSerializer(data=request.GET)
+    if not filters.is_valid():
+        return JsonResponse(filters.errors, status=400)
+
+    async def build():
+        # Cursor pagination evaluates the page itself, so only this part runs on the ORM's thread
+        return await sync_to_async(build_movie_page)(Request(request), filters=filters.get_filter())
+
+    data = await cache.acached_catalogue_data(request, 'async-movie-list', build)
+    return JsonResponse(data)
+
+
+async def movie_detail(request, pk):
+    try:
+        movie = await Movie.objects.prefetch_related(POSTERS_PREFETCH, SHOWTIMES_PREFETCH).aget(pk=pk)
+    except Movie.DoesNotExist:
+        raise Http404
+    return JsonResponse(MovieSerializer(movie, context={'request': request}).data)
+
+
+async def available_seats(request, pk):
+    version = await cache.aget_seat_version(pk)
+    if version is not None:
+        etag = f'"{pk}-{version}"'
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return HttpResponse(status=304, headers={'ETag': etag})
+        payload = await cache.aget_seat_availability(pk, version)
+        if payload is not None:
+            return JsonResponse(payload, safe=False, headers={'ETag': etag})
+
+    if not await Showtime.objects.filter(pk=pk).aexists():
+        raise Http404
+    version = await cache.aensure_seat_version(pk)
+    now = timezone.now()
+    seats = Seat.objects.filter(showtime_id=pk, is_reserved=False).exclude(
+        hold__expires_at__gt=now
+    ).defer('showtime')
+    payload = SeatSerializer([seat async for seat in seats], many=True).data
+    next_expiry = (await SeatHold.objects.filter(showtime_id=pk, expires_at__gt=now).aaggregate(
+        next_expiry=Min('expires_at')
+    ))['next_expiry']
+    await cache.aset_seat_availability(pk, version, payload, expires_at=next_expiry)
+    return JsonResponse(payload, safe=False, headers={'ETag': f'"{pk}-{version}"'})
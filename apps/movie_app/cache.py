@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import math
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+
+def _seat_version_key(showtime_id: int) -> str:
+    return f'movie:seats:{showtime_id}:version'
+
+
+def _seat_payload_key(showtime_id: int, version: int) -> str:
+    return f'movie:seats:{showtime_id}:{version}'
+
+
+def get_seat_version(showtime_id: int) -> int | None:
+    return cache.get(_seat_version_key(showtime_id))
+
+
+def ensure_seat_version(showtime_id: int) -> int:
+    # Versions start from the clock so an evicted counter never hands out an ETag that was used before.
+    # They expire like the payloads, a process-local cache that missed a bump is then stale for a bounded time
+    cache.add(_seat_version_key(showtime_id), time.time_ns(), timeout=settings.SEAT_AVAILABILITY_CACHE_TIMEOUT)
+    return cache.get(_seat_version_key(showtime_id))
+
+
+def get_seat_availability(showtime_id: int, version: int) -> list | None:
+    return cache.get(_seat_payload_key(showtime_id, version))
+
+
+def _seat_availability_timeout(expires_at: datetime | None) -> int:
+    timeout = settings.SEAT_AVAILABILITY_CACHE_TIMEOUT
+    if expires_at is not None:
+        timeout = min(timeout, max(math.ceil((expires_at - timezone.now()).total_seconds()), 1))
+    return timeout
+
+
+def set_seat_availability(showtime_id: int, version: int, payload: list, expires_at: datetime | None = None) -> None:
+    # Nothing bumps the version when a hold lapses, so the payload and its ETag die with the earliest active hold
+    timeout = _seat_availability_timeout(expires_at)
+    cache.set(_seat_payload_key(showtime_id, version), payload, timeout=timeout)
+    if expires_at is not None:
+        cache.touch(_seat_version_key(showtime_id), timeout=timeout)
+
+
+async def aget_seat_version(showtime_id: int) -> int | None:
+    return await cache.aget(_seat_version_key(showtime_id))
+
+
+async def aensure_seat_version(showtime_id: int) -> int:
+    await cache.aadd(
+        _seat_version_key(showtime_id), time.time_ns(), timeout=settings.SEAT_AVAILABILITY_CACHE_TIMEOUT
+    )
+    return await cache.aget(_seat_version_key(showtime_id))
+
+
+async def aget_seat_availability(showtime_id: int, version: int) -> list | None:
+    return await cache.aget(_seat_payload_key(showtime_id, version))
+
+
+async def aset_seat_availability(
+    showtime_id: int, version: int, payload: list, expires_at: datetime | None = None
+) -> None:
+    timeout = _seat_availability_timeout(expires_at)
+    await cache.aset(_seat_payload_key(showtime_id, version), payload, timeout=timeout)
+    if expires_at is not None:
+        await cache.atouch(_seat_version_key(showtime_id), timeout=timeout)
+
+
+def bump_seat_versions(showtime_ids) -> None:
+    for showtime_id in set(showtime_ids):
+        try:
+            cache.incr(_seat_version_key(showtime_id))
+        except ValueError:
+            cache.add(
+                _seat_version_key(showtime_id), time.time_ns(), timeout=settings.SEAT_AVAILABILITY_CACHE_TIMEOUT
+            )
+
+
+CATALOGUE_GENERATION_KEY = 'movie:catalogue:generation'
+# Separate from the catalogue generation, which also moves with showtimes and seat availability
+SEARCH_GENERATION_KEY = 'movie:search:generation'
+CATALOGUE_REBUILD_TIMEOUT = 10
+
+
+def _get_generation(key: str) -> int:
+    generation = cache.get(key)
+    if generation is None:
+        # Starts from the clock so an evicted generation never hands out keys that were used before
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+async def _aget_generation(key: str) -> int:
+    generation = await cache.aget(key)
+    if generation is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        generation = await cache.aget(key)
+    return generation
+
+
+def _bump_generation(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def get_catalogue_generation() -> int:
+    return _get_generation(CATALOGUE_GENERATION_KEY)
+
+
+async def aget_catalogue_generation() -> int:
+    return await _aget_generation(CATALOGUE_GENERATION_KEY)
+
+
+def bump_catalogue_generation() -> None:
+    _bump_generation(CATALOGUE_GENERATION_KEY)
+
+
+def get_search_generation() -> int:
+    return _get_generation(SEARCH_GENERATION_KEY)
+
+
+def bump_search_generation() -> None:
+    _bump_generation(SEARCH_GENERATION_KEY)
+
+
+def cached_catalogue_data(request, endpoint: str, build: Callable[[], Any]) -> Any:
+    """
+    Return the response data of a catalogue endpoint, built at most once per catalogue generation.
+
+    Entries are keyed by endpoint, host and query params under the current generation, so bumping the
+    generation invalidates every catalogue response at once. On a miss only the request that wins the
+    rebuild lock runs ``build``, the others wait for its result instead of all hitting the database.
+    """
+    key = _catalogue_key(request, endpoint, get_catalogue_generation())
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, timeout=CATALOGUE_REBUILD_TIMEOUT):
+        try:
+            data = build()
+            cache.set(key, data, timeout=settings.CATALOGUE_CACHE_TIMEOUT)
+        finally:
+            cache.delete(lock_key)
+        return data
+
+    deadline = time.monotonic() + CATALOGUE_REBUILD_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        data = cache.get(key)
+        if data is not None:
+            return data
+    # The rebuild is taking too long or failed, don't keep the client waiting any longer
+    return build()
+
+
+async def acached_catalogue_data(request, endpoint: str, build: Callable[[], Awaitable[Any]]) -> Any:
+    """Async counterpart of ``cached_catalogue_data``, entries are shared with the sync endpoints."""
+    key = _catalogue_key(request, endpoint, await aget_catalogue_generation())
+    data = await cache.aget(key)
+    if data is not None:
+        return data
+
+    lock_key = f'{key}:lock'
+    if await cache.aadd(lock_key, 1, timeout=CATALOGUE_REBUILD_TIMEOUT):
+        try:
+            data = await build()
+            await cache.aset(key, data, timeout=settings.CATALOGUE_CACHE_TIMEOUT)
+        finally:
+            await cache.adelete(lock_key)
+        return data
+
+    deadline = time.monotonic() + CATALOGUE_REBUILD_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        data = await cache.aget(key)
+        if data is not None:
+            return data
+    return await build()
+
+
+def _catalogue_key(request, endpoint: str, generation: int) -> str:
+    # request.GET works for both Django and DRF requests
+    params = urlencode(sorted(request.GET.lists()), doseq=True)
+    digest = hashlib.md5(f'{request.get_host()}?{params}'.encode()).hexdigest()
+    return f'movie:catalogue:{generation}:{endpoint}:{digest}'
@@ -66,6 +66,8 @@ movie_list_decorator = extend_schema(
     responses=serializer.MovieSerializer(many=True),
     methods=['GET'],
     summary='Movies list',
+    description='Every filter given narrows the list, e.g. ?genre=drama&language=english&showing_on=2026-10-18',
+    parameters=[serializer.MovieFilterSerializer],
 )
 
 movie_retrieve_decorator = extend_schema(
@@ -74,6 +76,33 @@ movie_retrieve_decorator = extend_schema(
     summary='Get a specific movie with ID'
 )
 
+movie_search_decorator = custom_decorator(
+    methods=['GET'],
+    url_path='search',
+    url_name='search',
+    pagination_class=None,
+    responses=serializer.MovieSerializer(many=True),
+    summary='Search movies',
+    description='Movies matching every word of the query in their title, director, genre, language or '
+                'description, best matches first. Words match by prefix and tolerate a typo or two',
+    parameters=[
+        OpenApiParameter(
+            name='q',
+            type=OpenApiTypes.STR,
+            required=True,
+            location=OpenApiParameter.QUERY,
+            description='Search query, e.g. "termin camer"',
+        ),
+        OpenApiParameter(
+            name='limit',
+            type=OpenApiTypes.INT,
+            required=False,
+            location=OpenApiParameter.QUERY,
+            description='Number of results, 20 by default and 50 at most',
+        ),
+    ],
+)
+
 movie_create_decorator = extend_schema(
     request=serializer.MovieSerializer,
     responses={201: 'application/json'},
@@ -126,18 +155,34 @@ movie_showtime_decorator = custom_decorator(
         OpenApiParameter(
             name='date',
             type=OpenApiTypes.DATE,
-            required=True,
+            required=False,
             location=OpenApiParameter.QUERY,
             description="Date to filter movies with showtimes",
-        )
+        ),
+        OpenApiParameter(
+            name='start_date',
+            type=OpenApiTypes.DATE,
+            required=False,
+            location=OpenApiParameter.QUERY,
+            description="First date of a date range, used along with end_date instead of date",
+        ),
+        OpenApiParameter(
+            name='end_date',
+            type=OpenApiTypes.DATE,
+            required=False,
+            location=OpenApiParameter.QUERY,
+            description="Last date of a date range (inclusive), at most 31 days after start_date",
+        ),
     ],
     summary='Movies show time for specific date',
-    description='Get a list of movies show time for a specific date along with movie info',
+    description='Get a list of movies show time for a specific date (or date range) along with movie info, '
+                'only the showtimes of the requested dates are included',
     responses=serializer.MovieSerializer(many=True),
     methods=['GET'],
     url_path='showtime',
     url_name='showtime',
     detail=False,
+    pagination_class=None,
 )
 
 available_seats_decorator = custom_decorator(
@@ -147,7 +192,45 @@ available_seats_decorator = custom_decorator(
     url_name='available_seat',
     responses=serializer.SeatSerializer(many=True),
     summary='Available seats for a show time',
-    description='Get a list of available seats for a show time by show time ID'
+    description='Get a list of available seats for a show time by show time ID. Responses carry an ETag, '
+                'send it back in If-None-Match to get a 304 when nothing changed'
+)
+
+showtime_schedule_decorator = custom_decorator(
+    detail=False,
+    methods=['POST'],
+    url_path='schedule',
+    url_name='schedule',
+    request=serializer.ShowtimeScheduleSerializer,
+    responses={201: 'application/json', 400: 'application/json', 409: 'application/json'},
+    summary='Schedule showtimes in bulk',
+    description='Create every combination of dates and start times of each entry, together with their seats '
+                'from the auditorium layout, only admin can perform this action. Nothing is created if any '
+                'showtime overlaps another showtime of the same auditorium',
+    examples=[
+        OpenApiExample(
+            name='Schedule request',
+            request_only=True,
+            value={'showtimes': [{
+                'movie': 1, 'auditorium': 2, 'dates': ['2024-11-04', '2024-11-05'], 'start_times': ['14:00', '18:30'],
+            }]}
+        ),
+        OpenApiExample(
+            name='Successful schedule response',
+            response_only=True,
+            status_codes=["201"],
+            value={'response': '4 showtimes created', 'showtimes': [31, 32, 33, 34]}
+        ),
+        OpenApiExample(
+            name='Overlapping showtimes response',
+            response_only=True,
+            status_codes=["409"],
+            value={
+                'error': 'Showtimes overlap with other showtimes of their auditorium',
+                'conflicts': [{'auditorium': 2, 'showtime': '2024-11-04 18:30', 'overlaps': 'existing showtime 12'}],
+            }
+        ),
+    ]
 )
 
 reservation_list_decoration = extend_schema(
@@ -156,30 +239,69 @@ reservation_list_decoration = extend_schema(
     summary='Reservations list',
 )
 
+reservation_export_decorator = custom_decorator(
+    methods=['GET'],
+    url_path='export',
+    url_name='export',
+    responses={(200, 'text/csv'): OpenApiTypes.STR, (200, 'application/x-ndjson'): OpenApiTypes.STR},
+    summary='Export reservations',
+    description='Staff only. Streams every reservation with its user, movie, showtime and seats as CSV or NDJSON, '
+                'one line per reservation, without loading them all in memory',
+    parameters=[
+        OpenApiParameter(
+            name='output',
+            type=OpenApiTypes.STR,
+            enum=['csv', 'ndjson'],
+            required=False,
+            location=OpenApiParameter.QUERY,
+            description='Export format, csv by default',
+        ),
+        OpenApiParameter(
+            name='date_from',
+            type=OpenApiTypes.DATE,
+            required=False,
+            location=OpenApiParameter.QUERY,
+            description='Only reservations made on or after this day',
+        ),
+        OpenApiParameter(
+            name='date_to',
+            type=OpenApiTypes.DATE,
+            required=False,
+            location=OpenApiParameter.QUERY,
+            description='Only reservations made on or before this day',
+        ),
+    ],
+)
+
 reservation_create_decorator = extend_schema(
     request=serializer.ReservationCreateSerializer,
-    responses={201: 'application/json'},
+    responses={201: 'application/json', 409: 'application/json'},
     summary='Create a reservation with selected showtime and seats',
-    description='Endpoint to create a reservation for a specific showtime and selected seats',
+    description='Endpoint to create a reservation for a specific showtime and selected seats, '
+                'either all of the selected seats are reserved or none of them',
     examples=[
         OpenApiExample(
             name='Successful create response',
             response_only=True,
             status_codes=["201"],
             value={'response': 'Created successfully'}
-        )
+        ),
+        OpenApiExample(
+            name='Unavailable seats response',
+            response_only=True,
+            status_codes=["409"],
+            value={'error': 'Seats 12, 13 are not available', 'seats': [12, 13]}
+        ),
+        OpenApiExample(
+            name='Existing reservation response',
+            response_only=True,
+            status_codes=["409"],
+            value={'error': 'You already have a reservation for this showtime', 'reservation': 7}
+        ),
     ]
 )
 
 reservation_cancel_decorator = custom_decorator(
-    parameters=[
-        OpenApiParameter(
-          name='reservation ID',
-          required=True,
-          type=OpenApiTypes.INT,
-          location=OpenApiParameter.PATH,
-        ),
-    ],
     responses={204: 'application/json'},
     examples=[
         OpenApiExample(
@@ -193,5 +315,69 @@ reservation_cancel_decorator = custom_decorator(
     methods=['DELETE'],
     url_path='cancel',
     url_name='cancel_reservation',
+    detail=True,
+)
+
+seat_hold_decorator = custom_decorator(
+    request=serializer.SeatHoldSerializer,
+    responses={201: 'application/json', 409: 'application/json'},
+    examples=[
+        OpenApiExample(
+            name='Successful hold response',
+            response_only=True,
+            status_codes=["201"],
+            value={'expires_at': '2024-11-05T13:36:00Z'}
+        ),
+        OpenApiExample(
+            name='Unavailable seats response',
+            response_only=True,
+            status_codes=["409"],
+            value={'error': 'Seats 12, 13 are not available', 'seats': [12, 13]}
+        ),
+    ],
+    summary='Hold seats before checkout',
+    description='Temporarily lock the selected seats of a showtime for the user, the hold expires after '
+                'a few minutes unless it is extended or turned into a reservation',
+    methods=['POST'],
+    url_path='hold',
+    url_name='hold',
+    detail=False,
+)
+
+seat_hold_extend_decorator = custom_decorator(
+    request=serializer.SeatHoldSerializer,
+    responses={200: 'application/json'},
+    examples=[
+        OpenApiExample(
+            name='Successful extend response',
+            response_only=True,
+            status_codes=["200"],
+            value={'expires_at': '2024-11-05T13:46:00Z'}
+        ),
+    ],
+    summary='Extend held seats',
+    description='Extend the expiry of the active seat holds of the user for a showtime',
+    methods=['POST'],
+    url_path='hold/extend',
+    url_name='hold_extend',
+    detail=False,
+)
+
+seat_hold_release_decorator = custom_decorator(
+    request=serializer.SeatHoldSerializer,
+    responses={204: 'application/json'},
+    examples=[
+        OpenApiExample(
+            name='Successful release response',
+            response_only=True,
+            status_codes=["204"],
+            value={'response': 'Released successfully'}
+        ),
+    ],
+    summary='Release held seats',
+    description='Release the seat holds of the user for a showtime',
+    methods=['DELETE'],
+    url_path='hold/release',
+    url_name='hold_release',
     detail=False,
 )
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import threading
+from functools import lru_cache
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+HEARTBEAT_INTERVAL = 15
+RESYNC = json.dumps({'type': 'resync'})
+
+
+class BaseBroker:
+    """
+    Fans seat events of a showtime out to its listeners.
+
+    Events are published from the (sync) booking paths and consumed by async SSE streams. A broker
+    for several processes (e.g. Redis pub/sub) only has to relay the messages it receives into
+    ``InMemoryBroker.publish`` of each process, so one message still serves every local listener.
+    """
+
+    def publish(self, showtime_id: int, event: dict) -> None:
+        raise NotImplementedError
+
+    def listen(self, showtime_id: int):
+        """Async iterator of serialized events, yields ``None`` when there was nothing to send for a while."""
+        raise NotImplementedError
+
+
+class InMemoryBroker(BaseBroker):
+    queue_size = 100
+
+    def __init__(self):
+        self._listeners = {}
+        self._lock = threading.Lock()
+
+    def publish(self, showtime_id, event):
+        with self._lock:
+            listeners = list(self._listeners.get(showtime_id, ()))
+        if not listeners:
+            return
+        # Serialize once, however many clients are listening
+        data = json.dumps(event)
+        for loop, queue in listeners:
+            loop.call_soon_threadsafe(self._deliver, queue, data)
+
+    @staticmethod
+    def _deliver(queue, data):
+        try:
+            queue.put_nowait(data)
+        except asyncio.QueueFull:
+            # The client fell behind, drop its backlog and ask it to refetch the seat map instead
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESYNC)
+
+    async def listen(self, showtime_id):
+        listener = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.queue_size))
+        with self._lock:
+            self._listeners.setdefault(showtime_id, set()).add(listener)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(listener[1].get(), timeout=HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                listeners = self._listeners.get(showtime_id)
+                listeners.discard(listener)
+                if not listeners:
+                    del self._listeners[showtime_id]
+
+
+@lru_cache(maxsize=None)
+def get_broker() -> BaseBroker:
+    return import_string(settings.SEAT_EVENTS_BROKER)()
+
+
+def publish_seat_event(showtime_id: int, event_type: str, seat_ids) -> None:
+    get_broker().publish(showtime_id, {'type': event_type, 'seats': sorted(seat_ids)})
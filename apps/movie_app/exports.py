@@ -0,0 +1,83 @@
+import csv
+import io
+from datetime import date, datetime, time, timedelta
+from typing import Iterator
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.utils import timezone
+from .models import Reservation, Seat
+
+EXPORT_FORMATS = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+COLUMNS = (
+    'reservation', 'created_at', 'user', 'user_name', 'movie', 'movie_title',
+    'showtime', 'show_date', 'start_time', 'auditorium', 'seat_count', 'seats',
+)
+
+
+def reservation_rows(
+        date_from: date | None = None, date_to: date | None = None, chunk_size: int | None = None
+) -> Iterator[dict]:
+    """
+    One dict per reservation (keys of ``COLUMNS``) made by the given range of days, inclusive.
+
+    Reservations are streamed a chunk at a time with the seats of each chunk prefetched in one query,
+    so memory use stays flat whatever the number of reservations, and reservations without seats are
+    exported too. The days are turned into a ``created_at`` range that ``reservation_created_idx`` serves.
+    """
+    reservations = Reservation.objects.select_related('user', 'movie', 'showtime__auditorium').only(
+        'created_at', 'user__first_name', 'user__last_name', 'movie__title',
+        'showtime__show_date', 'showtime__start_time', 'showtime__auditorium__name',
+    )
+    if date_from:
+        reservations = reservations.filter(created_at__gte=_start_of_day(date_from))
+    if date_to:
+        reservations = reservations.filter(created_at__lt=_start_of_day(date_to + timedelta(days=1)))
+    reservations = reservations.order_by('created_at', 'id').prefetch_related(
+        Prefetch('seats', queryset=Seat.objects.only('id', 'row', 'seat_number').order_by('seat_number'))
+    )
+
+    for reservation in reservations.iterator(chunk_size=chunk_size or settings.EXPORT_CHUNK_SIZE):
+        seats = reservation.seats.all()
+        showtime, auditorium = reservation.showtime, reservation.showtime.auditorium
+        yield {
+            'reservation': reservation.id,
+            'created_at': reservation.created_at,
+            'user': reservation.user_id,
+            'user_name': f'{reservation.user.first_name} {reservation.user.last_name}'.strip(),
+            'movie': reservation.movie_id,
+            'movie_title': reservation.movie.title,
+            'showtime': showtime.id,
+            'show_date': showtime.show_date,
+            'start_time': showtime.start_time,
+            'auditorium': auditorium.name if auditorium else '',
+            'seat_count': len(seats),
+            'seats': ' '.join(f'{seat.row}{seat.seat_number}' for seat in seats),
+        }
+
+
+def _start_of_day(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def export_lines(rows: Iterator[dict], export_format: str, batch_size: int | None = None) -> Iterator[str]:
+    """Serialize the rows as CSV (with a header) or NDJSON, yielding text a batch of rows at a time."""
+    batch_size = batch_size or settings.EXPORT_CHUNK_SIZE
+    buffer = io.StringIO()
+    if export_format == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(COLUMNS)
+    else:
+        encoder = DjangoJSONEncoder(separators=(',', ':'))
+
+    for count, row in enumerate(rows, 1):
+        if export_format == 'csv':
+            writer.writerow(row.values())
+        else:
+            buffer.write(encoder.encode(row) + '\n')
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
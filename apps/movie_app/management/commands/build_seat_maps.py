@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from apps.movie_app.models import Showtime
+from apps.movie_app.services import build_seat_maps
+
+
+class Command(BaseCommand):
+    help = 'Switch showtimes to compact seat map storage, seeding the bitmaps from their seats'
+
+    def add_arguments(self, parser):
+        parser.add_argument('showtime_ids', nargs='*', type=int, help='Showtimes to convert, all of them if omitted')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        queryset = Showtime.objects.order_by('id')
+        if options['showtime_ids']:
+            queryset = queryset.filter(id__in=options['showtime_ids'])
+        showtime_ids = list(queryset.values_list('id', flat=True))
+
+        batch_size = options['batch_size']
+        for start in range(0, len(showtime_ids), batch_size):
+            build_seat_maps(showtime_ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(f'{len(showtime_ids)} showtimes switched to seat maps.'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from apps.movie_app.exports import EXPORT_FORMATS, reservation_rows, export_lines
+
+
+def _date(value):
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise CommandError(f'{value} is not a date in the format YYYY-MM-DD')
+    return day
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream every reservation with its user, movie, showtime and seats as CSV or NDJSON, '
+        'memory use stays flat however many reservations there are'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--output', help='Write the export to this file instead of stdout')
+        parser.add_argument('--date-from', type=_date, help='Only reservations made on or after this day')
+        parser.add_argument('--date-to', type=_date, help='Only reservations made on or before this day')
+        parser.add_argument('--chunk-size', type=int, help='Rows fetched at a time, EXPORT_CHUNK_SIZE by default')
+
+    def handle(self, *args, **options):
+        rows = reservation_rows(
+            date_from=options['date_from'], date_to=options['date_to'], chunk_size=options['chunk_size']
+        )
+        lines = export_lines(rows, options['format'], batch_size=options['chunk_size'])
+        if not options['output']:
+            for chunk in lines:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', newline='') as file:
+            file.writelines(lines)
+        self.stdout.write(self.style.SUCCESS(f"Reservations exported to {options['output']}"))
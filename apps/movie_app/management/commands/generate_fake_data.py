@@ -1,59 +1,173 @@
 import random
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, time, timedelta
+from io import BytesIO
+from itertools import islice
+from string import ascii_uppercase
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
 from django.core.management.base import BaseCommand
+from django.db import connection, connections, transaction
+from django.utils.text import slugify
 from faker import Faker
+from PIL import Image
 from apps.account_app.models import CustomUser
-from apps.movie_app.models import MovieGenre, Movie, MoviePoster, Seat, Showtime, Reservation
+from apps.movie_app.models import MovieGenre, Movie, MoviePoster, Seat, Showtime, Reservation, Auditorium, SeatClass
+from apps.movie_app.services import adjust_reserved_counts
+
+# Rows are generated in fixed size chunks, each seeded from its own position, so the same seed
+# produces the same data whatever the batch size or number of workers
+CHUNK_SIZE = 10_000
+RESERVATION_CHUNK_SIZE = 100
+ROW_SIZE = 20
+# Coprime with 10**9, so multiplying maps every user index to a distinct phone number
+PHONE_MULTIPLIER = 387_420_489
+
+
+def _user_rows(start, stop, seed):
+    fake = Faker()
+    fake.seed_instance(f'{seed}-users-{start}')
+    rows = []
+    for index in range(start, stop):
+        first_name, last_name = fake.first_name(), fake.last_name()
+        rows.append((
+            first_name,
+            last_name,
+            f'09{index * PHONE_MULTIPLIER % 10 ** 9:09d}',
+            f'{first_name}.{last_name}.{index}@example.com'.lower(),
+        ))
+    return rows
+
+
+def _reservation_rows(showtimes, seats_per_showtime, user_count, seed):
+    """
+    Pick the users and seats of the reservations of a chunk of showtimes.
+    ``showtimes`` is a list of ``(showtime index, number of reservations)``, every reservation
+    takes 1-5 distinct seat numbers and a user books a showtime at most once.
+    """
+    rows = []
+    for showtime_index, count in showtimes:
+        rng = random.Random(f'{seed}-reservations-{showtime_index}')
+        free = list(range(1, seats_per_showtime + 1))
+        rng.shuffle(free)
+        for user_index in rng.sample(range(user_count), min(count, user_count)):
+            seat_count = rng.randint(1, 5)
+            if seat_count > len(free):
+                break
+            rows.append((showtime_index, user_index, [free.pop() for _ in range(seat_count)]))
+    return rows
+
+
+def _row_name(index):
+    name = ''
+    while True:
+        index, letter = divmod(index, 26)
+        name = ascii_uppercase[letter] + name
+        if not index:
+            return name
+        index -= 1
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
 
 
 class Command(BaseCommand):
-    help = 'Generate fake data for models'
+    help = 'Generate fake data for models, use the options to build production sized datasets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5)
+        parser.add_argument('--genres', type=int, default=5)
+        parser.add_argument('--movies', type=int, default=5)
+        parser.add_argument('--posters', type=int, default=5)
+        parser.add_argument('--showtimes', type=int, default=5)
+        parser.add_argument('--seats-per-showtime', type=int, default=30)
+        parser.add_argument('--reservations', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT')
+        parser.add_argument('--workers', type=int, default=1, help='Processes generating users and reservations')
+        parser.add_argument('--seed', type=int, help='Seed for reproducible data, a random one is printed if omitted')
 
     def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.workers = options['workers']
+        seed = options['seed'] if options['seed'] is not None else random.randrange(2 ** 32)
+        self.stdout.write(f'Using seed {seed}')
+        self.rng = random.Random(seed)
         fake = Faker()
-        self._generate_users(fake, count=5)
-        self._generate_movie_genres(fake, count=5)
-        self._generate_movies(fake, count=5)
-        self._generate_movie_posters(fake, count=5)
-        self._generate_showtimes(fake, count=5)
-        self._generate_seats(fake, count=30)
-        self._generate_reservation(fake, count=10)
+        fake.seed_instance(seed)
+
+        self._generate_users(seed, count=options['users'])
+        self._generate_movie_genres(fake, count=options['genres'])
+        self._generate_movies(fake, count=options['movies'])
+        self._generate_movie_posters(fake, count=options['posters'])
+        auditorium = self._generate_auditorium(seats=options['seats_per_showtime'])
+        showtimes = self._generate_showtimes(auditorium, count=options['showtimes'])
+        self._generate_seats(showtimes, auditorium)
+        self._generate_reservation(
+            seed, showtimes, seats_per_showtime=options['seats_per_showtime'], count=options['reservations']
+        )
         self.stdout.write(self.style.SUCCESS('Fake data generation completed!'))
 
-    def _generate_users(self, fake, count):
-        users = []
-        for _ in range(count):
-            phone_number = f'09{random.randint(100000000, 999999999)}'
-            email = fake.unique.email()
-            user = CustomUser(
-                first_name=fake.first_name(),
-                last_name=fake.last_name(),
-                phone=phone_number,
-                email=email,
-                is_active=True,
+    def _run_chunks(self, fn, tasks):
+        """Yield ``fn(*task)`` for every task in order, on worker processes when ``--workers`` is above 1."""
+        if self.workers <= 1:
+            for task in tasks:
+                yield fn(*task)
+            return
+
+        # Forked workers must not inherit the open database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=django.setup) as executor:
+            pending = deque()
+            for task in tasks:
+                pending.append(executor.submit(fn, *task))
+                # Keep a bounded backlog so generated rows don't pile up faster than they are inserted
+                if len(pending) >= 2 * self.workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def _generate_users(self, seed, count):
+        # Hashing once instead of per user, PBKDF2 would otherwise dominate the whole run
+        password = make_password('password123')
+        offset = CustomUser.objects.count()
+        tasks = (
+            (start, min(start + CHUNK_SIZE, offset + count), seed)
+            for start in range(offset, offset + count, CHUNK_SIZE)
+        )
+        for rows in self._run_chunks(_user_rows, tasks):
+            CustomUser.objects.bulk_create(
+                (
+                    CustomUser(first_name=first_name, last_name=last_name, phone=phone, email=email,
+                               password=password, is_active=True)
+                    for first_name, last_name, phone, email in rows
+                ),
+                batch_size=self.batch_size,
             )
-            user.set_password('password123')
-            users.append(user)
-        CustomUser.objects.bulk_create(users)
         self.stdout.write(f'{count} CustomUser records created.')
 
     def _generate_movie_genres(self, fake, count):
         genres = []
         for _ in range(count):
-            name = fake.unique.word().capitalize(),
+            name = fake.unique.word().capitalize()
             genre = MovieGenre(
                 name=name,
                 description=fake.text(max_nb_chars=200),
-                slug=name,
+                slug=slugify(name),
             )
             genres.append(genre)
-        MovieGenre.objects.bulk_create(genres)
+        MovieGenre.objects.bulk_create(genres, batch_size=self.batch_size)
         self.stdout.write(f'{count} MovieGenre records created.')
 
     def _generate_movies(self, fake, count):
         genres = list(MovieGenre.objects.all())
         movies = []
         for _ in range(count):
-            genre = random.choice(genres) if genres else None
+            genre = self.rng.choice(genres) if genres else None
             title = fake.unique.sentence(nb_words=3)
             movie = Movie(
                 genre=genre,
@@ -61,24 +175,22 @@ class Command(BaseCommand):
                 description=fake.text(),
                 release_date=fake.date_between(start_date='-5y', end_date='today'),
                 director=fake.name(),
-                duration=random.randint(80, 180),
+                duration=self.rng.randint(80, 180),
                 language=fake.language_name(),
-                slug=title,
+                slug=slugify(title),
             )
+            movie.search_document = movie.build_search_document()
             movies.append(movie)
-        Movie.objects.bulk_create(movies)
-        self.stdout.write(f'{count} MovieGenre records created.')
+        Movie.objects.bulk_create(movies, batch_size=self.batch_size)
+        self.stdout.write(f'{count} Movie records created.')
 
     def _generate_movie_posters(self, fake, count):
-        from PIL import Image
-        from io import BytesIO
-        from django.core.files.base import ContentFile
-
         movies = list(Movie.objects.all())
         for _ in range(count):
-            movie = random.choice(movies)
+            movie = self.rng.choice(movies)
             # Create a placeholder image
-            img = Image.new('RGB', (500, 700), color=(random.randint(0, 255), random.randint(0, 255), random.randint(0, 255)))
+            color = (self.rng.randint(0, 255), self.rng.randint(0, 255), self.rng.randint(0, 255))
+            img = Image.new('RGB', (500, 700), color=color)
             img_buffer = BytesIO()
             img.save(img_buffer, format='JPEG')
             img_buffer.seek(0)
@@ -88,60 +200,115 @@ class Command(BaseCommand):
             poster.poster.save(f'{fake.unique.word()}.jpg', ContentFile(img_buffer.read()), save=True)
         self.stdout.write(f'{count} MoviePoster records created.')
 
-    def _generate_showtimes(self, fake, count):
-        movies = list(Movie.objects.all())
-        showtimes = []
-        for _ in range(count):
-            movie = random.choice(movies)
-            show_date = fake.date_between(start_date='-30d', end_date='+30d')
-            start_time = fake.time_object()
-            showtime = Showtime(
-                movie=movie,
-                show_date=show_date,
-                start_time=start_time,
-            )
-            showtimes.append(showtime)
-        Showtime.objects.bulk_create(showtimes)
+    def _generate_auditorium(self, seats):
+        """An auditorium of rows of ``ROW_SIZE`` seats, the back row being premium."""
+        if not seats:
+            return None
+        row_count = -(-seats // ROW_SIZE)
+        layout = [
+            {
+                'row': _row_name(index),
+                'seats': min(ROW_SIZE, seats - index * ROW_SIZE),
+                'seat_class': SeatClass.PREMIUM if index == row_count - 1 and row_count > 1 else SeatClass.STANDARD,
+            }
+            for index in range(row_count)
+        ]
+        auditorium, _ = Auditorium.objects.get_or_create(name=f'Auditorium {seats}', defaults={'layout': layout})
+        self.stdout.write(f'Using {auditorium} with {auditorium.capacity} seats.')
+        return auditorium
+
+    def _generate_showtimes(self, auditorium, count):
+        """Returns ``(id, movie_id)`` of the created showtimes."""
+        movie_ids = list(Movie.objects.values_list('id', flat=True))
+        today = date.today()
+        created = []
+        for batch in _batches(range(count), self.batch_size):
+            showtimes = Showtime.objects.bulk_create([
+                Showtime(
+                    movie_id=self.rng.choice(movie_ids),
+                    auditorium=auditorium,
+                    capacity=auditorium.capacity if auditorium else 0,
+                    show_date=today + timedelta(days=self.rng.randint(-30, 30)),
+                    start_time=time(self.rng.randint(9, 23), self.rng.choice((0, 15, 30, 45))),
+                )
+                for _ in batch
+            ])
+            created += [(showtime.id, showtime.movie_id) for showtime in showtimes]
         self.stdout.write(f'{count} Showtime records created.')
+        return created
 
-    def _generate_seats(self, fake, count):
-        showtimes = list(Showtime.objects.all())
-        seats = []
-        for _ in range(count):
-            showtime = random.choice(showtimes)
-            seat = Seat(
-                showtime=showtime,
-                seat_number=random.randint(10, 100),
-                is_reserved=random.choice([True, False]),
-            )
-            seats.append(seat)
-        Seat.objects.bulk_create(seats)
-        self.stdout.write(f'{count} Seat records created.')
+    def _generate_seats(self, showtimes, auditorium):
+        layout = list(auditorium.seat_layout()) if auditorium else []
+        self._insert_rows(Seat, ('showtime', 'seat_number', 'row', 'seat_class', 'is_reserved'), (
+            (showtime_id, seat_number, row, seat_class, False)
+            for showtime_id, _ in showtimes
+            for seat_number, row, seat_class in layout
+        ))
+        self.stdout.write(f'{len(showtimes) * len(layout)} Seat records created.')
 
-    def _generate_reservation(self, fake, count):
-        users = list(CustomUser.objects.all())
-        showtimes = list(Showtime.objects.all())
-        for _ in range(count):
-            user = random.choice(users)
-            showtime = random.choice(showtimes)
-            movie = showtime.movie
-            available_seats = Seat.objects.filter(showtime=showtime, is_reserved=False)
-            if not available_seats:
-                self.stdout.write(self.style.WARNING(f"No available seats for showtime {showtime.id}."))
-                continue
-            if Reservation.objects.filter(user=user, movie=movie, showtime=showtime).exists():
-                continue
-            # Reserve 1-5 random seats
-            max_seats_to_reserve = min(len(available_seats), random.randint(1, 5))
-            if max_seats_to_reserve == 0:
-                continue
-            reserved_seats = random.sample(list(available_seats), k=max_seats_to_reserve)
-            reservation = Reservation.objects.create(
-                user=user,
-                movie=movie,
-                showtime=showtime,
+    def _insert_rows(self, model, fields, rows):
+        """
+        Plain executemany INSERT of value tuples. Used for the tables with millions of rows and no
+        defaults to fill, where building a model instance per row would cost more than the insert itself.
+        """
+        table = connection.ops.quote_name(model._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(model._meta.get_field(field).column) for field in fields)
+        sql = f"INSERT INTO {table} ({columns}) VALUES ({', '.join(['%s'] * len(fields))})"
+        with transaction.atomic(), connection.cursor() as cursor:
+            for batch in _batches(rows, self.batch_size):
+                cursor.executemany(sql, batch)
+
+    def _generate_reservation(self, seed, showtimes, seats_per_showtime, count):
+        user_ids = list(CustomUser.objects.order_by('id').values_list('id', flat=True))
+        if not showtimes or not user_ids or not seats_per_showtime:
+            self.stdout.write(self.style.WARNING('No showtimes, seats or users to create reservations for.'))
+            return
+
+        # Spread the reservations evenly, the first showtimes take the remainder
+        per_showtime, remainder = divmod(count, len(showtimes))
+        quotas = [(index, per_showtime + (index < remainder)) for index in range(len(showtimes))]
+        tasks = (
+            (chunk, seats_per_showtime, len(user_ids), seed)
+            for chunk in _batches(quotas, RESERVATION_CHUNK_SIZE)
+        )
+        created = 0
+        for rows in self._run_chunks(_reservation_rows, tasks):
+            if rows:
+                self._create_reservations(showtimes, user_ids, rows)
+                created += len(rows)
+        if created < count:
+            self.stdout.write(self.style.WARNING(f'Showtimes are full, only {created} reservations fit.'))
+        self.stdout.write(self.style.SUCCESS(f'{created} Reservations created successfully!'))
+
+    def _create_reservations(self, showtimes, user_ids, rows):
+        showtime_ids = {showtimes[showtime_index][0] for showtime_index, _, _ in rows}
+        seat_ids = {
+            (showtime_id, seat_number): seat_id
+            for seat_id, showtime_id, seat_number in Seat.objects.filter(
+                showtime_id__in=showtime_ids
+            ).values_list('id', 'showtime_id', 'seat_number')
+        }
+        with transaction.atomic():
+            reservations = Reservation.objects.bulk_create(
+                [
+                    Reservation(
+                        user_id=user_ids[user_index],
+                        movie_id=showtimes[showtime_index][1],
+                        showtime_id=showtimes[showtime_index][0],
+                    )
+                    for showtime_index, user_index, _ in rows
+                ],
+                batch_size=self.batch_size,
             )
-            reservation.seats.set(reserved_seats)
-            # Mark seats as reserved
-            available_seats.filter(id__in=[seat.id for seat in reserved_seats]).update(is_reserved=True)
-        self.stdout.write(self.style.SUCCESS(f'{count} Reservations created successfully!'))
+            reserved = [
+                (reservation.id, seat_ids[showtimes[showtime_index][0], seat_number])
+                for reservation, (showtime_index, _, seat_numbers) in zip(reservations, rows)
+                for seat_number in seat_numbers
+            ]
+            self._insert_rows(Reservation.seats.through, ('reservation', 'seat'), reserved)
+            for batch in _batches((seat_id for _, seat_id in reserved), self.batch_size):
+                Seat.objects.filter(id__in=batch).update(is_reserved=True)
+            reserved_counts = Counter()
+            for showtime_index, _, seat_numbers in rows:
+                reserved_counts[showtimes[showtime_index][0]] += len(seat_numbers)
+            adjust_reserved_counts(reserved_counts)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from apps.movie_app.models import MoviePoster
+from apps.movie_app.posters import generate_renditions
+
+
+class Command(BaseCommand):
+    help = 'Generate the resized JPEG/WebP copies of posters, for posters uploaded before renditions existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Regenerate the renditions of every poster')
+
+    def handle(self, *args, **options):
+        queryset = MoviePoster.objects.order_by('id')
+        if not options['all']:
+            queryset = queryset.filter(renditions={})
+        poster_ids = list(queryset.values_list('id', flat=True))
+        for poster_id in poster_ids:
+            generate_renditions(poster_id)
+        self.stdout.write(self.style.SUCCESS(f'Renditions generated for {len(poster_ids)} posters.'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from apps.movie_app.services import reconcile_seat_counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Recount the capacity and reserved seats of showtimes from their seat rows and repair the counters '
+        'that drifted, e.g. after seats were edited by hand. All showtimes by default'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('showtime_ids', nargs='*', type=int, help='Only these showtimes')
+
+    def handle(self, *args, **options):
+        count = reconcile_seat_counters(options['showtime_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'{count} showtime counters repaired.'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from apps.movie_app.cache import bump_catalogue_generation
+from apps.movie_app.models import MoviePoster, media_url
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored poster URLs, run it after changing MEDIA_BASE_URL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        posters = []
+        queryset = MoviePoster.objects.only('id', 'poster', 'url', 'renditions')
+        for poster in queryset.iterator(chunk_size=options['batch_size']):
+            renditions = {
+                name: {
+                    key: {**value, 'url': media_url(value['name'])} if isinstance(value, dict) else value
+                    for key, value in rendition.items()
+                }
+                for name, rendition in poster.renditions.items()
+            }
+            url = poster.build_url()
+            if url != poster.url or renditions != poster.renditions:
+                poster.url = url
+                poster.renditions = renditions
+                posters.append(poster)
+        MoviePoster.objects.bulk_update(posters, ['url', 'renditions'], batch_size=options['batch_size'])
+        bump_catalogue_generation()
+        self.stdout.write(self.style.SUCCESS(f'{len(posters)} poster URLs updated.'))
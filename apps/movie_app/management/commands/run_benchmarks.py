@@ -0,0 +1,241 @@
+import json
+import random
+import subprocess
+import threading
+import time
+from datetime import date
+from io import StringIO
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from apps.account_app.models import CustomUser
+from apps.movie_app.cache import bump_catalogue_generation, bump_seat_versions
+from apps.movie_app.models import Seat, Showtime, Reservation
+from utils.testdb import temporary_database
+
+
+def _percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, max(0, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _summary(latencies, queries, statuses, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'throughput_per_second': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(_percentile(latencies, 99) * 1000, 2),
+        'mean_queries': round(sum(queries) / len(queries), 2) if queries else None,
+        'max_queries': max(queries) if queries else None,
+        'statuses': {str(code): statuses.count(code) for code in sorted(set(statuses))},
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a temporary database and measure throughput, p50/p99 latency and query counts of the booking '
+        'and catalogue endpoints, results are written as JSON. Run it with production-like settings, '
+        'the development ones add nplusone to every request'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--movies', type=int, default=50)
+        parser.add_argument('--showtimes', type=int, default=200)
+        parser.add_argument('--seats-per-showtime', type=int, default=200)
+        parser.add_argument('--reservations', type=int, default=5000)
+        parser.add_argument('--iterations', type=int, default=200, help='Measured requests per scenario')
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent buyers in the contention scenario')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Write the JSON results to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        self.iterations = options['iterations']
+        self.rng = random.Random(options['seed'])
+        with temporary_database():
+            call_command(
+                'generate_fake_data',
+                users=options['users'], genres=10, movies=options['movies'], posters=0,
+                showtimes=options['showtimes'], seats_per_showtime=options['seats_per_showtime'],
+                reservations=options['reservations'], seed=options['seed'], stdout=StringIO(),
+            )
+            results = {
+                'meta': self._meta(options),
+                'scenarios': {
+                    'login': self._login(),
+                    'movie_list': self._get('/api/movie/list/'),
+                    'movie_list_uncached': self._get('/api/movie/list/', before=bump_catalogue_generation),
+                    'movie_showtimes': self._movie_showtimes(cached=True),
+                    'movie_showtimes_uncached': self._movie_showtimes(cached=False),
+                    'available_seats': self._available_seats(cached=True),
+                    'available_seats_uncached': self._available_seats(cached=False),
+                    **self._booking(),
+                    'booking_contention': self._contention(options['threads']),
+                },
+            }
+
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def _meta(self, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, cwd=settings.BASE_DIR
+            ).stdout.strip() or None
+        except OSError:
+            commit = None
+        return {
+            'commit': commit,
+            'database': connection.vendor,
+            'django': django.get_version(),
+            'dataset': {key: options[key] for key in (
+                'users', 'movies', 'showtimes', 'seats_per_showtime', 'reservations', 'seed'
+            )},
+            'iterations': self.iterations,
+        }
+
+    def _measure(self, requests, before=None):
+        """Run ``(client, method, path, data)`` requests one after another, ``before`` runs untimed ahead of each."""
+        latencies, queries, statuses = [], [], []
+        elapsed = 0.0
+        for client, method, path, data in requests:
+            if before:
+                before()
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = getattr(client, method)(path, data, format='json')
+                latency = time.perf_counter() - start
+            elapsed += latency
+            latencies.append(latency)
+            queries.append(len(captured))
+            statuses.append(response.status_code)
+        return _summary(latencies, queries, statuses, elapsed)
+
+    def _get(self, path, before=None):
+        client = APIClient()
+        return self._measure(((client, 'get', path, None) for _ in range(self.iterations)), before=before)
+
+    def _login(self):
+        phones = list(CustomUser.objects.values_list('phone', flat=True)[:self.iterations])
+        client = APIClient()
+        return self._measure(
+            (client, 'post', '/api/account/auth/login/', {'phone': self.rng.choice(phones), 'password': 'password123'})
+            for _ in range(self.iterations)
+        )
+
+    def _movie_showtimes(self, cached):
+        client = APIClient()
+        return self._measure(
+            ((client, 'get', f'/api/movie/list/showtime/?date={date.today()}', None) for _ in range(self.iterations)),
+            before=None if cached else bump_catalogue_generation,
+        )
+
+    def _available_seats(self, cached):
+        showtime_ids = list(Showtime.objects.values_list('id', flat=True))
+        showtime_id = self.rng.choice(showtime_ids)
+        client = APIClient()
+        return self._measure(
+            ((client, 'get', f'/api/movie/showtimes/{showtime_id}/available_seats/', None)
+             for _ in range(self.iterations)),
+            before=None if cached else lambda: bump_seat_versions([showtime_id]),
+        )
+
+    def _buyers(self, count, prefix):
+        """``(user, client)`` pairs of fresh users, their phones start with ``prefix`` unlike the seeded ones."""
+        password = CustomUser.objects.values_list('password', flat=True).first()
+        users = CustomUser.objects.bulk_create(
+            CustomUser(first_name='Bench', last_name='Buyer', phone=f'{prefix}{index:08d}',
+                       email=f'buyer.{prefix}.{index}@example.com', password=password)
+            for index in range(count)
+        )
+        buyers = []
+        for user in users:
+            client = APIClient()
+            client.force_authenticate(user)
+            buyers.append((user, client))
+        return buyers
+
+    def _free_seats(self):
+        seats = {}
+        for showtime_id, seat_id in Seat.objects.filter(
+                showtime__show_date__gte=date.today(), is_reserved=False
+        ).values_list('showtime_id', 'id'):
+            seats.setdefault(showtime_id, []).append(seat_id)
+        return seats
+
+    def _booking(self):
+        """Every buyer books two free seats of an upcoming showtime, then cancels the reservation."""
+        free = [(showtime_id, seats) for showtime_id, seats in self._free_seats().items() if len(seats) >= 2]
+        bookings = []
+        for user, client in self._buyers(self.iterations, '080'):
+            showtime_id, seats = self.rng.choice(free)
+            bookings.append((user, client, showtime_id, [seats.pop(), seats.pop()]))
+            if len(seats) < 2:
+                free.remove((showtime_id, seats))
+
+        create = self._measure(
+            (client, 'post', '/api/movie/reservation/', {'showtime': showtime_id, 'seats': seat_ids})
+            for _, client, showtime_id, seat_ids in bookings
+        )
+        reservations = dict(Reservation.objects.filter(user__phone__startswith='080').values_list('user_id', 'id'))
+        cancel = self._measure(
+            (client, 'delete', f'/api/movie/reservation/{reservations[user.id]}/cancel/', None)
+            for user, client, _, _ in bookings
+        )
+        return {'reservation_create': create, 'reservation_cancel': cancel}
+
+    def _contention(self, threads):
+        """
+        ``threads`` buyers race for the same two seats, round after round with fresh buyers. Exactly one
+        of them should win each round and the others get a 409, a seat booked twice is reported.
+        """
+        showtime_id, seats = max(self._free_seats().items(), key=lambda item: len(item[1]))
+        rounds = min(max(self.iterations // threads, 1), len(seats) // 2)
+        buyers = self._buyers(threads * rounds, '081')
+        latencies, statuses = [], []
+        lock = threading.Lock()
+
+        def buy(client, barrier, seat_ids):
+            barrier.wait()
+            start = time.perf_counter()
+            response = client.post(
+                '/api/movie/reservation/', {'showtime': showtime_id, 'seats': seat_ids}, format='json'
+            )
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                statuses.append(response.status_code)
+            connection.close()
+
+        elapsed = 0.0
+        for number in range(rounds):
+            seat_ids = seats[number * 2:number * 2 + 2]
+            barrier = threading.Barrier(threads)
+            workers = [
+                threading.Thread(target=buy, args=(client, barrier, seat_ids))
+                for _, client in buyers[number * threads:(number + 1) * threads]
+            ]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed += time.perf_counter() - start
+
+        booked = Reservation.seats.through.objects.filter(seat_id__in=seats[:rounds * 2])
+        return {
+            **_summary(latencies, [], statuses, elapsed),
+            'threads': threads,
+            'rounds': rounds,
+            'won_rounds': statuses.count(201),
+            'double_booked_seats': booked.count() - booked.values('seat_id').distinct().count(),
+        }
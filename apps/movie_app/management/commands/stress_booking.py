@@ -0,0 +1,150 @@
+import random
+import threading
+import time
+from collections import Counter
+from datetime import date, time as clock
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import override_settings
+from apps.account_app.models import CustomUser
+from apps.movie_app.models import Auditorium, Movie, Reservation, Seat, Showtime
+from apps.movie_app.services import (
+    ReservationExistsError, SeatUnavailableError, build_seat_maps, create_showtimes, reserve_seats,
+)
+from utils.testdb import temporary_database
+
+ROW_SIZE = 20
+
+
+class Command(BaseCommand):
+    help = (
+        'Let many threads book random seats of one showtime in a temporary database, then check that no '
+        'seat was booked twice and that the seat rows, seat map and reservations agree. Exits with an '
+        'error when an invariant is broken or a booking failed unexpectedly. SQLite runs write transactions '
+        'one at a time, only a PostgreSQL database exercises real row-level contention'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--attempts', type=int, default=50, help='Bookings tried by every thread')
+        parser.add_argument('--seats', type=int, default=100, help='Seats of the showtime')
+        parser.add_argument('--max-seats', type=int, default=4, help='Most seats asked for by one booking')
+        parser.add_argument(
+            '--locking', choices=('optimistic', 'pessimistic'), help='Overrides the SEAT_LOCKING setting'
+        )
+        parser.add_argument('--seat-map', action='store_true', help='Store the showtime seats in a seat map')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        locking = options['locking'] or settings.SEAT_LOCKING
+        with override_settings(SEAT_LOCKING=locking), temporary_database():
+            showtime = self._showtime(options['seats'], options['seat_map'])
+            outcomes, errors, elapsed = self._run(showtime, options)
+            problems = self._check(showtime, outcomes['booked'])
+
+        self.stdout.write(
+            f"{connection.vendor}, {locking} locking{', seat map' if options['seat_map'] else ''}: "
+            f"{options['threads']} threads x {options['attempts']} attempts in {elapsed:.2f}s"
+        )
+        for outcome, count in sorted(outcomes.items()):
+            self.stdout.write(f'  {outcome}: {count}')
+        for error, count in errors.most_common():
+            self.stdout.write(self.style.ERROR(f'  unexpected {error}: {count}'))
+        for problem in problems:
+            self.stdout.write(self.style.ERROR(f'  {problem}'))
+        if errors or problems:
+            raise CommandError('Stress run failed')
+        self.stdout.write(self.style.SUCCESS('No double bookings, seat rows and reservations agree.'))
+
+    def _showtime(self, seats, seat_map):
+        auditorium = Auditorium.objects.create(name='Stress', layout=[
+            {'row': str(row + 1), 'seats': min(ROW_SIZE, seats - row * ROW_SIZE), 'seat_class': 'standard'}
+            for row in range(-(-seats // ROW_SIZE))
+        ])
+        movie = Movie.objects.create(title='Stress', duration=120)
+        [showtime] = create_showtimes([
+            Showtime(movie=movie, auditorium=auditorium, show_date=date.today(), start_time=clock(20))
+        ])
+        if seat_map:
+            build_seat_maps([showtime.id])
+            showtime.refresh_from_db()
+        return showtime
+
+    def _run(self, showtime, options):
+        threads, attempts = options['threads'], options['attempts']
+        # Each thread books for half as many users as it has attempts, so repeat bookings are exercised too
+        users_per_thread = max(attempts // 2, 1)
+        password = make_password(None)
+        users = CustomUser.objects.bulk_create(
+            CustomUser(first_name='Stress', last_name='Buyer', phone=f'09{index:09d}',
+                       email=f'stress.{index}@example.com', password=password)
+            for index in range(threads * users_per_thread)
+        )
+        seat_ids = list(Seat.objects.filter(showtime=showtime).values_list('id', flat=True))
+        outcomes, errors = Counter(), Counter()
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads)
+
+        def book(number):
+            rng = random.Random(options['seed'] + number)
+            pool = users[number * users_per_thread:(number + 1) * users_per_thread]
+            local, failures = Counter(), Counter()
+            barrier.wait()
+            try:
+                for _ in range(attempts):
+                    chosen = rng.sample(seat_ids, rng.randint(1, options['max_seats']))
+                    try:
+                        reserve_seats(rng.choice(pool), showtime, chosen)
+                        local['booked'] += 1
+                    except SeatUnavailableError:
+                        local['seat conflicts'] += 1
+                    except ReservationExistsError:
+                        local['repeat bookings refused'] += 1
+                    except Exception as e:
+                        failures[f'{type(e).__name__}: {e}'] += 1
+            finally:
+                connection.close()
+            with lock:
+                outcomes.update(local)
+                errors.update(failures)
+
+        workers = [threading.Thread(target=book, args=(number,)) for number in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        outcomes.setdefault('booked', 0)
+        return outcomes, errors, time.perf_counter() - start
+
+    def _check(self, showtime, booked):
+        problems = []
+        through = Reservation.seats.through.objects.filter(reservation__showtime=showtime)
+        double = through.values('seat_id').annotate(count=Count('id')).filter(count__gt=1).count()
+        if double:
+            problems.append(f'{double} seats are in more than one reservation')
+
+        linked = set(through.values_list('seat_id', flat=True))
+        flagged = set(Seat.objects.filter(showtime=showtime, is_reserved=True).values_list('id', flat=True))
+        if linked != flagged:
+            problems.append(
+                f'{len(flagged - linked)} seats are flagged reserved without a reservation, '
+                f'{len(linked - flagged)} reserved seats are not flagged'
+            )
+
+        reservations = Reservation.objects.filter(showtime=showtime).count()
+        if reservations != booked:
+            problems.append(f'{reservations} reservations exist for {booked} successful bookings')
+
+        showtime.refresh_from_db()
+        if showtime.reserved_count != len(flagged):
+            problems.append(f'The showtime counts {showtime.reserved_count} reserved seats, {len(flagged)} are reserved')
+        if showtime.seat_map is not None:
+            numbers = set(Seat.objects.filter(id__in=linked).values_list('seat_number', flat=True))
+            seat_map = showtime.get_seat_map()
+            if seat_map.count() != len(numbers) or set(seat_map.reserved(numbers)) != numbers:
+                problems.append('The seat map does not match the reserved seats')
+        return problems
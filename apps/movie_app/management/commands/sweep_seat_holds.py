@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from apps.movie_app.services import sweep_expired_holds
+
+
+class Command(BaseCommand):
+    help = 'Release every expired seat hold, meant to be run periodically (e.g. from cron every minute)'
+
+    def handle(self, *args, **options):
+        count = sweep_expired_holds()
+        self.stdout.write(self.style.SUCCESS(f'{count} expired seat holds released.'))
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0008_alter_moviegenre_is_active'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='showtime',
+            name='seat_map',
+            field=models.BinaryField(blank=True, help_text='Packed bitset of reserved seat numbers', null=True),
+        ),
+        migrations.AddField(
+            model_name='showtime',
+            name='seat_map_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:47
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils.encoding import filepath_to_uri
+
+
+def fill_poster_urls(apps, schema_editor):
+    MoviePoster = apps.get_model('movie_app', 'MoviePoster')
+    posters = list(MoviePoster.objects.only('id', 'poster'))
+    for poster in posters:
+        if settings.MEDIA_BASE_URL:
+            poster.url = f"{settings.MEDIA_BASE_URL.rstrip('/')}/{filepath_to_uri(poster.poster.name)}"
+        else:
+            poster.url = poster.poster.url
+    MoviePoster.objects.bulk_update(posters, ['url'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0011_reservation_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movieposter',
+            name='url',
+            field=models.CharField(blank=True, editable=False, help_text='Resolved poster URL', max_length=255),
+        ),
+        migrations.RunPython(fill_poster_urls, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0012_movieposter_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movieposter',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized copies by name'),
+        ),
+    ]
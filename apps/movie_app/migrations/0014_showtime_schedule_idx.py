@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0013_movieposter_renditions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='showtime',
+            index=models.Index(fields=['show_date', 'start_time', 'movie'], name='showtime_schedule_idx'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F
+from apps.movie_app.seatmap import SeatMap
+
+
+def renumber_duplicate_seats(apps, schema_editor):
+    """
+    Seats sharing a number within a showtime are moved after the showtime's highest seat number,
+    so they keep their reservations and (showtime, seat_number) can be made unique.
+    """
+    Seat = apps.get_model('movie_app', 'Seat')
+    Showtime = apps.get_model('movie_app', 'Showtime')
+    showtime_ids = set(
+        Seat.objects.values('showtime_id', 'seat_number').annotate(count=Count('id')).filter(count__gt=1)
+        .values_list('showtime_id', flat=True)
+    )
+    for showtime_id in showtime_ids:
+        seats = list(Seat.objects.filter(showtime_id=showtime_id).order_by('seat_number', 'id'))
+        next_number = seats[-1].seat_number
+        numbers, renumbered = set(), []
+        for seat in seats:
+            if seat.seat_number in numbers:
+                next_number += 1
+                seat.seat_number = next_number
+                renumbered.append(seat)
+            numbers.add(seat.seat_number)
+        Seat.objects.bulk_update(renumbered, ['seat_number'])
+
+        if Showtime.objects.filter(pk=showtime_id, seat_map__isnull=False).exists():
+            reserved = [seat.seat_number for seat in seats if seat.is_reserved]
+            Showtime.objects.filter(pk=showtime_id).update(
+                seat_map=SeatMap.from_seat_numbers(reserved).to_bytes(), seat_map_version=F('seat_map_version') + 1
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0014_showtime_schedule_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Auditorium',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('layout', models.JSONField(default=list, help_text='Rows from front to back, e.g. [{"row": "A", "seats": 12, "seat_class": "standard"}]. Seats are numbered from 1 across the rows in that order')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='seat',
+            name='row',
+            field=models.CharField(blank=True, max_length=8),
+        ),
+        migrations.AddField(
+            model_name='seat',
+            name='seat_class',
+            field=models.CharField(choices=[('standard', 'Standard'), ('premium', 'Premium'), ('accessible', 'Accessible')], default='standard', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='showtime',
+            name='auditorium',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='showtimes', to='movie_app.auditorium'),
+        ),
+        migrations.RunPython(renumber_duplicate_seats, migrations.RunPython.noop),
+    ]
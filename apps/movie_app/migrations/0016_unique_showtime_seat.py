@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0015_auditorium'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='seat',
+            constraint=models.UniqueConstraint(fields=('showtime', 'seat_number'), name='unique_showtime_seat'),
+        ),
+    ]
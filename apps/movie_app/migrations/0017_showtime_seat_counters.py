@@ -0,0 +1,44 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:16
+
+import django.db.models.expressions
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_seats(apps, schema_editor):
+    Seat = apps.get_model('movie_app', 'Seat')
+    Showtime = apps.get_model('movie_app', 'Showtime')
+    seats = Seat.objects.filter(showtime=OuterRef('pk')).order_by().values('showtime')
+    Showtime.objects.update(
+        capacity=Coalesce(Subquery(seats.annotate(count=Count('id')).values('count')), 0),
+        reserved_count=Coalesce(
+            Subquery(seats.filter(is_reserved=True).annotate(count=Count('id')).values('count')), 0
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0016_unique_showtime_seat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='showtime',
+            name='capacity',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='showtime',
+            name='reserved_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='showtime',
+            name='available_count',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('capacity'), '-', models.F('reserved_count')), output_field=models.IntegerField()),
+        ),
+        migrations.RunPython(count_seats, migrations.RunPython.noop),
+    ]
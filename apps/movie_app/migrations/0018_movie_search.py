@@ -0,0 +1,50 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:22
+
+from django.db import migrations, models
+
+
+def fill_search_documents(apps, schema_editor):
+    Movie = apps.get_model('movie_app', 'Movie')
+    movies = []
+    for movie in Movie.objects.select_related('genre').iterator(chunk_size=1000):
+        genre = movie.genre.name if movie.genre_id else None
+        movie.search_document = ' '.join(
+            filter(None, (movie.title, movie.director, genre, movie.language, movie.description))
+        )
+        movies.append(movie)
+    Movie.objects.bulk_update(movies, ['search_document'], batch_size=1000)
+
+
+def _search_index():
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+    # Must stay the expression apps.movie_app.search matches with
+    return GinIndex(SearchVector('search_document', config='simple'), name='movie_search_idx')
+
+
+def create_search_index(apps, schema_editor):
+    # Only PostgreSQL has full-text indexes, the other backends search an in-process index
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_index(apps.get_model('movie_app', 'Movie'), _search_index())
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('movie_app', 'Movie'), _search_index())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0017_showtime_seat_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='search_document',
+            field=models.TextField(blank=True, editable=False, help_text='Searchable text of the movie, full-text indexed on PostgreSQL'),
+        ),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,6 +1,18 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
 from django.db import models
+from django.db.models.functions import Upper
+from django.utils.encoding import filepath_to_uri
 from django.utils.text import slugify
 from apps.account_app.models import CustomUser
+from .seatmap import SeatMap
+
+
+def media_url(name):
+    if settings.MEDIA_BASE_URL:
+        return f"{settings.MEDIA_BASE_URL.rstrip('/')}/{filepath_to_uri(name)}"
+    return default_storage.url(name)
 
 
 class BaseModel(models.Model):
@@ -35,12 +47,28 @@ class Movie(BaseModel):
     duration = models.PositiveSmallIntegerField(help_text="Duration in minutes", null=True, blank=True)
     language = models.CharField(max_length=100, blank=True, null=True)
     slug = models.SlugField(max_length=128, unique=True, blank=True)
+    search_document = models.TextField(
+        blank=True, editable=False, help_text='Searchable text of the movie, full-text indexed on PostgreSQL'
+    )
+
+    class Meta:
+        # Back the filters of the movie list, the language one matches case-insensitively
+        indexes = [
+            models.Index(Upper('language'), name='movie_language_idx'),
+            models.Index(fields=['release_date'], name='movie_release_date_idx'),
+            models.Index(fields=['duration'], name='movie_duration_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+        self.search_document = self.build_search_document()
         super(Movie, self).save(*args, **kwargs)
 
+    def build_search_document(self):
+        genre = self.genre.name if self.genre_id else None
+        return ' '.join(filter(None, (self.title, self.director, genre, self.language, self.description)))
+
     def __str__(self):
         return self.title
 
@@ -51,19 +79,129 @@ class MoviePoster(models.Model):
     poster_width = models.PositiveSmallIntegerField(null=True, blank=True)
     poster_height = models.PositiveSmallIntegerField(null=True, blank=True)
     size = models.FloatField(blank=True, help_text='in kilobytes')
+    url = models.CharField(max_length=255, blank=True, editable=False, help_text='Resolved poster URL')
+    renditions = models.JSONField(default=dict, blank=True, editable=False, help_text='Resized copies by name')
 
     def save(self, *args, **kwargs):
         self.size = self.poster.size / 1000
         super(MoviePoster, self).save(*args, **kwargs)
+        # The final file name is only known once the storage has saved the upload
+        url = self.build_url()
+        if url != self.url:
+            self.url = url
+            MoviePoster.objects.filter(pk=self.pk).update(url=url)
+            # A new file was uploaded, its resized copies are generated in the background
+            from .posters import schedule_renditions
+            schedule_renditions(self.pk)
+
+    def build_url(self):
+        return media_url(self.poster.name)
 
     def __str__(self):
         return self.movie.title
 
 
+class SeatClass(models.TextChoices):
+    STANDARD = 'standard', 'Standard'
+    PREMIUM = 'premium', 'Premium'
+    ACCESSIBLE = 'accessible', 'Accessible'
+
+
+class SeatAvailability(models.TextChoices):
+    AVAILABLE = 'available', 'Available'
+    FEW_LEFT = 'few_left', 'Few seats left'
+    SOLD_OUT = 'sold_out', 'Sold out'
+
+    @classmethod
+    def of(cls, available_count: int) -> 'SeatAvailability':
+        if available_count <= 0:
+            return cls.SOLD_OUT
+        if available_count <= settings.FEW_SEATS_LEFT:
+            return cls.FEW_LEFT
+        return cls.AVAILABLE
+
+
+class Auditorium(BaseModel):
+    name = models.CharField(max_length=100, unique=True)
+    layout = models.JSONField(
+        default=list,
+        help_text='Rows from front to back, e.g. [{"row": "A", "seats": 12, "seat_class": "standard"}]. '
+                  'Seats are numbered from 1 across the rows in that order'
+    )
+
+    def clean(self):
+        if not isinstance(self.layout, list) or not self.layout:
+            raise ValidationError({'layout': 'Layout must be a non-empty list of rows'})
+        rows = set()
+        for row in self.layout:
+            if not isinstance(row, dict) or not row.get('row') or row['row'] in rows:
+                raise ValidationError({'layout': 'Every row needs a unique "row" name'})
+            if not isinstance(row.get('seats'), int) or row['seats'] < 1:
+                raise ValidationError({'layout': f'Row {row["row"]} needs a positive number of "seats"'})
+            if row.get('seat_class', SeatClass.STANDARD) not in SeatClass.values:
+                raise ValidationError({'layout': f'Row {row["row"]} has an unknown seat class'})
+            rows.add(row['row'])
+        if self.capacity > 32767:
+            raise ValidationError({'layout': 'An auditorium can have at most 32767 seats'})
+
+    @property
+    def capacity(self):
+        return sum(row['seats'] for row in self.layout)
+
+    def seat_layout(self):
+        """``(seat_number, row, seat_class)`` of every seat of the auditorium."""
+        seat_number = 0
+        for row in self.layout:
+            seat_class = row.get('seat_class', SeatClass.STANDARD)
+            for _ in range(row['seats']):
+                seat_number += 1
+                yield seat_number, row['row'], seat_class
+
+    def __str__(self):
+        return self.name
+
+
 class Showtime(models.Model):
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='showtimes')
+    auditorium = models.ForeignKey(
+        Auditorium, on_delete=models.PROTECT, null=True, blank=True, related_name='showtimes'
+    )
     show_date = models.DateField()
     start_time = models.TimeField()
+    seat_map = models.BinaryField(
+        null=True, blank=True, editable=False, help_text='Packed bitset of reserved seat numbers'
+    )
+    seat_map_version = models.PositiveIntegerField(default=0, editable=False)
+    # Maintained by the booking services so occupancy is known without counting seats,
+    # reconcile_seat_counters repairs them if they ever drift
+    capacity = models.PositiveIntegerField(default=0, editable=False)
+    reserved_count = models.PositiveIntegerField(default=0, editable=False)
+    available_count = models.GeneratedField(
+        expression=models.F('capacity') - models.F('reserved_count'),
+        output_field=models.IntegerField(),
+        db_persist=True,
+    )
+
+    SERVICE_FIELDS = ('seat_map', 'seat_map_version', 'capacity', 'reserved_count')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['show_date', 'start_time', 'movie'], name='showtime_schedule_idx'),
+            # Answers "does this movie show on that date" for the showing_on filter of the movie list
+            models.Index(fields=['movie', 'show_date'], name='showtime_movie_date_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # The seat map and counters are only written by the booking services, with compare-and-set and
+            # F() updates. A save from an instance loaded earlier (e.g. an admin edit) must not roll them back.
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and not field.generated
+                and field.name not in self.SERVICE_FIELDS and field.attname not in deferred
+            ]
+        super(Showtime, self).save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.movie.title} at {self.start_time} on {self.show_date}"
@@ -71,12 +209,30 @@ class Showtime(models.Model):
     def get_date(self):
         return f"{self.start_time} - {self.show_date}"
 
+    @property
+    def availability(self):
+        return SeatAvailability.of(self.available_count)
+
+    def get_seat_map(self):
+        return SeatMap(self.seat_map) if self.seat_map is not None else None
+
+    def is_seat_available(self, seat_number):
+        seat_map = self.get_seat_map()
+        if seat_map is None:
+            return self.seats.filter(seat_number=seat_number, is_reserved=False).exists()
+        return not seat_map.is_reserved(seat_number)
+
 
 class Seat(models.Model):
     showtime = models.ForeignKey(Showtime, on_delete=models.CASCADE, related_name='seats')
     seat_number = models.PositiveSmallIntegerField()
+    row = models.CharField(max_length=8, blank=True)
+    seat_class = models.CharField(max_length=16, choices=SeatClass.choices, default=SeatClass.STANDARD)
     is_reserved = models.BooleanField(default=False)
 
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['showtime', 'seat_number'], name='unique_showtime_seat')]
+
     def __str__(self):
         return f"Seat {self.seat_number} for {self.showtime}"
 
@@ -90,6 +246,18 @@ class Reservation(BaseModel):
     class Meta:
         ordering = ['-created_at']
         constraints = [models.UniqueConstraint(fields=['user', 'movie', 'showtime'], name='user_reservation')]
+        indexes = [models.Index(fields=['-created_at', '-id'], name='reservation_created_idx')]
 
     def __str__(self):
         return f"Reservation by {self.user} for {self.movie} | {self.showtime.get_date()}"
+
+
+class SeatHold(models.Model):
+    seat = models.OneToOneField(Seat, on_delete=models.CASCADE, related_name='hold')
+    showtime = models.ForeignKey(Showtime, on_delete=models.CASCADE, related_name='seat_holds')
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='seat_holds')
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Hold on {self.seat} by {self.user} until {self.expires_at}"
@@ -6,7 +6,7 @@ class IsAdminOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
         elif request.user.is_authenticated and request.user.is_active:
-            if view.action == 'create':
+            if view.action in ('create', 'schedule'):
                 return request.user.is_staff
             return True
         return False
@@ -24,4 +24,4 @@ class ReservationCustomPermission(permissions.BasePermission):
         return False
 
     def has_object_permission(self, request, view, obj):
-        return request.user.is_staff or request.user.id == obj.user.id
+        return request.user.is_staff or request.user.id == obj.user_id
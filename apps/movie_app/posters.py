@@ -0,0 +1,76 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image
+from .cache import bump_catalogue_generation
+from .models import MoviePoster, media_url
+
+logger = logging.getLogger(__name__)
+
+RENDITION_FORMATS = {'jpeg': 'jpg', 'webp': 'webp'}
+
+_executor = ThreadPoolExecutor(max_workers=settings.POSTER_RENDITION_WORKERS, thread_name_prefix='poster-renditions')
+
+
+def schedule_renditions(poster_id: int) -> None:
+    """Generate the poster's renditions on the worker pool once the current transaction commits."""
+    transaction.on_commit(lambda: _executor.submit(_generate_in_background, poster_id))
+
+
+def _generate_in_background(poster_id):
+    try:
+        generate_renditions(poster_id)
+    except Exception:
+        logger.exception('Generating renditions for poster %s failed', poster_id)
+    finally:
+        # Worker threads get their own connection which nothing else would ever close
+        connection.close()
+
+
+def generate_renditions(poster_id: int) -> dict:
+    """
+    Write a resized JPEG and WebP copy of the poster for every width in ``POSTER_RENDITION_WIDTHS``
+    and store their file names and URLs on the poster.
+    """
+    try:
+        poster = MoviePoster.objects.only('id', 'poster', 'renditions').get(pk=poster_id)
+    except MoviePoster.DoesNotExist:
+        return {}
+
+    with poster.poster.open('rb') as file:
+        original = Image.open(file)
+        original.load()
+    if original.mode not in ('RGB', 'L'):
+        original = original.convert('RGB')
+
+    stem = os.path.splitext(os.path.basename(poster.poster.name))[0]
+    renditions = {}
+    for name, width in settings.POSTER_RENDITION_WIDTHS.items():
+        image = original.copy()
+        image.thumbnail((width, width * 10), Image.LANCZOS)
+        rendition = {'width': image.width, 'height': image.height}
+        for image_format, extension in RENDITION_FORMATS.items():
+            buffer = BytesIO()
+            image.save(buffer, format=image_format, quality=80, optimize=True)
+            file_name = default_storage.save(
+                f'posters/renditions/{stem}-{name}.{extension}', ContentFile(buffer.getvalue())
+            )
+            rendition[image_format] = {'name': file_name, 'url': media_url(file_name)}
+        renditions[name] = rendition
+
+    delete_rendition_files(poster.renditions)
+    MoviePoster.objects.filter(pk=poster_id).update(renditions=renditions)
+    bump_catalogue_generation()
+    return renditions
+
+
+def delete_rendition_files(renditions: dict) -> None:
+    for rendition in renditions.values():
+        for image_format in RENDITION_FORMATS:
+            if image_format in rendition:
+                default_storage.delete(rendition[image_format]['name'])
@@ -0,0 +1,221 @@
+"""
+Movie search over title, director, genre, language and description.
+
+Query terms are matched by prefix and, when a term is not a known word, by edit distance against
+the vocabulary of the catalogue, so "termin" and "termnator" both find "Terminator". On PostgreSQL
+the expanded terms are matched by the full-text index of ``Movie.search_document``, elsewhere by
+an in-process inverted index. Either way the index lives in the memory of each process and is
+rebuilt in the background when the search generation moves (movies or genres changed).
+"""
+import heapq
+import logging
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from django.db import connection, connections
+from .cache import get_search_generation
+from .models import Movie
+
+try:
+    from rapidfuzz import process
+    from rapidfuzz.distance import Levenshtein
+except ImportError:  # pragma: no cover, typo tolerance is skipped without RapidFuzz
+    process = None
+
+logger = logging.getLogger(__name__)
+
+TOKEN = re.compile(r'\w+')
+# Field weights of the in-process index, a title match ranks above a description match
+FIELD_WEIGHTS = (('title', 4.0), ('director', 2.0), ('genre__name', 2.0), ('language', 1.0), ('description', 0.5))
+PREFIX_FACTOR = 0.8
+TYPO_FACTOR = 0.6
+MIN_PREFIX_LENGTH = 2
+MIN_TYPO_LENGTH = 4
+MAX_EXPANSIONS = 20
+MAX_TERMS = 8
+
+
+def tokenize(text: str | None) -> list[str]:
+    return TOKEN.findall(text.casefold()) if text else []
+
+
+class MovieSearchIndex:
+    """
+    Vocabulary of the catalogue, sorted for prefix lookups and bucketed by length for typo lookups,
+    plus the postings when the database has no full-text search: for every token the movies
+    containing it, grouped by the weight of the best field they contain it in.
+    """
+
+    def __init__(self, generation: int, postings: dict[str, tuple] | None, vocabulary: set[str]):
+        self.generation = generation
+        self.postings = postings
+        self.vocabulary = sorted(vocabulary)
+        self._known = vocabulary
+        self._by_length = defaultdict(list)
+        for token in self.vocabulary:
+            self._by_length[len(token)].append(token)
+
+    @classmethod
+    def build(cls, generation: int, with_postings: bool) -> 'MovieSearchIndex':
+        fields = [field for field, _ in FIELD_WEIGHTS]
+        best = defaultdict(dict)
+        vocabulary = set()
+        for row in Movie.objects.order_by().values_list('id', *fields).iterator(chunk_size=5000):
+            movie_id = row[0]
+            for value, (_, weight) in zip(row[1:], FIELD_WEIGHTS):
+                for token in tokenize(value):
+                    if not with_postings:
+                        vocabulary.add(token)
+                    elif best[token].get(movie_id, 0) < weight:
+                        best[token][movie_id] = weight
+        if not with_postings:
+            return cls(generation, None, vocabulary)
+
+        postings = {}
+        for token, weights in best.items():
+            groups = defaultdict(list)
+            for movie_id, weight in weights.items():
+                groups[weight].append(movie_id)
+            postings[token] = tuple(sorted(
+                ((weight, frozenset(ids)) for weight, ids in groups.items()), key=lambda group: group[0], reverse=True
+            ))
+        return cls(generation, postings, set(postings))
+
+    def expand(self, term: str) -> dict[str, float]:
+        """Vocabulary tokens the term stands for, with how much a match on each of them counts."""
+        expansions = {}
+        if term in self._known:
+            expansions[term] = 1.0
+        if len(term) >= MIN_PREFIX_LENGTH:
+            index = bisect_left(self.vocabulary, term)
+            for token in self.vocabulary[index:index + MAX_EXPANSIONS + 1]:
+                if not token.startswith(term):
+                    break
+                expansions.setdefault(token, PREFIX_FACTOR)
+        if term not in self._known and len(term) >= MIN_TYPO_LENGTH and process is not None:
+            max_edits = 1 if len(term) < 8 else 2
+            for length in range(len(term) - max_edits, len(term) + max_edits + 1):
+                for token, _, _ in process.extract(
+                        term, self._by_length.get(length, ()), scorer=Levenshtein.distance,
+                        score_cutoff=max_edits, limit=MAX_EXPANSIONS,
+                ):
+                    expansions.setdefault(token, TYPO_FACTOR)
+        return expansions
+
+    def search(self, query: str, limit: int) -> list[int]:
+        """Ids of the best matching movies, every term of the query has to match."""
+        expanded = [self.expand(term) for term in tokenize(query)[:MAX_TERMS]]
+        if not expanded or not all(expanded):
+            return []
+        if self.postings is None:
+            return _search_database(expanded, limit)
+
+        groups = [self._score_groups(expansions) for expansions in expanded]
+        if len(groups) == 1:
+            return self._top_of_groups(groups[0], limit)
+
+        # The rarest term first, the others are only looked up for the movies still in the running
+        groups.sort(key=lambda term_groups: sum(len(ids) for _, ids in term_groups))
+        scores = {}
+        # Lowest scores first, so every movie ends up with the score of its best match
+        for score, ids in reversed(groups[0]):
+            scores.update(dict.fromkeys(ids, score))
+        for term_groups in groups[1:]:
+            pending, matched = set(scores), {}
+            for score, ids in term_groups:
+                hits = pending & ids
+                pending -= hits
+                matched.update((movie_id, scores[movie_id] + score) for movie_id in hits)
+            scores = matched
+            if not scores:
+                return []
+        return heapq.nlargest(limit, scores, key=lambda movie_id: (scores[movie_id], -movie_id))
+
+    def _score_groups(self, expansions: dict[str, float]) -> list[tuple[float, frozenset]]:
+        return sorted(
+            ((weight * factor, ids) for token, factor in expansions.items() for weight, ids in self.postings[token]),
+            key=lambda group: group[0], reverse=True,
+        )
+
+    @staticmethod
+    def _top_of_groups(groups: list[tuple[float, frozenset]], limit: int) -> list[int]:
+        """A single term needs no score per movie, the best groups are taken until the limit is reached."""
+        found = {}
+        for _, ids in groups:
+            for movie_id in ids:
+                if movie_id not in found:
+                    found[movie_id] = None
+                    if len(found) == limit:
+                        return list(found)
+        return list(found)
+
+
+def _search_database(expanded: list[dict[str, float]], limit: int) -> list[int]:
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+    # Tokens are \w+ words of the vocabulary, nothing in them needs escaping
+    raw = ' & '.join(f"({' | '.join(expansions)})" for expansions in expanded)
+    query = SearchQuery(raw, search_type='raw', config='simple')
+    # The same expression as the movie_search_idx GIN index, so the match is answered by it
+    vector = SearchVector('search_document', config='simple')
+    return list(
+        Movie.objects.annotate(document=vector).filter(document=query)
+        .annotate(rank=SearchRank(vector, query)).order_by('-rank', 'id')
+        .values_list('id', flat=True)[:limit]
+    )
+
+
+def refresh_search_documents(movies) -> int:
+    """Rebuild ``search_document`` of the movies of the queryset, e.g. after their genre was renamed."""
+    batch, count = [], 0
+    for movie in movies.select_related('genre').order_by().iterator(chunk_size=1000):
+        movie.search_document = movie.build_search_document()
+        batch.append(movie)
+        if len(batch) == 1000:
+            count += Movie.objects.bulk_update(batch, ['search_document'])
+            batch = []
+    return count + Movie.objects.bulk_update(batch, ['search_document'])
+
+
+_index = None
+_lock = threading.Lock()
+_rebuilding = False
+
+
+def _build(generation: int) -> MovieSearchIndex:
+    return MovieSearchIndex.build(generation, with_postings=connection.vendor != 'postgresql')
+
+
+def _rebuild_in_background(generation: int) -> None:
+    global _index, _rebuilding
+    try:
+        _index = _build(generation)
+    except Exception:
+        logger.exception('Rebuilding the movie search index failed')
+    finally:
+        _rebuilding = False
+        connections.close_all()
+
+
+def get_search_index() -> MovieSearchIndex:
+    """
+    The search index of the current generation. The first call builds it, later changes are
+    picked up by a background rebuild while the previous index keeps serving.
+    """
+    global _index, _rebuilding
+    generation = get_search_generation()
+    index = _index
+    if index is not None and index.generation == generation:
+        return index
+    with _lock:
+        if _index is None:
+            _index = _build(generation)
+        elif _index.generation != generation and not _rebuilding:
+            _rebuilding = True
+            threading.Thread(target=_rebuild_in_background, args=(generation,), daemon=True).start()
+        return _index
+
+
+def search_movies(query: str, limit: int) -> list[int]:
+    return get_search_index().search(query, limit)
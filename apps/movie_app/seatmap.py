@@ -0,0 +1,44 @@
+from typing import Iterable
+
+
+class SeatMap:
+    """
+    Packed bitset of the reserved seats of a showtime, bit ``n`` is set when seat number ``n`` is reserved.
+    Seats outside the stored range are considered free, so the map grows lazily as seats get reserved.
+    """
+    __slots__ = ('_bits',)
+
+    def __init__(self, data: bytes | memoryview | None = None):
+        self._bits = bytearray(data or b'')
+
+    @classmethod
+    def from_seat_numbers(cls, seat_numbers: Iterable[int]) -> 'SeatMap':
+        seat_map = cls()
+        seat_map.reserve(seat_numbers)
+        return seat_map
+
+    def is_reserved(self, seat_number: int) -> bool:
+        index = seat_number >> 3
+        return index < len(self._bits) and bool(self._bits[index] >> (seat_number & 7) & 1)
+
+    def reserved(self, seat_numbers: Iterable[int]) -> list[int]:
+        return [number for number in seat_numbers if self.is_reserved(number)]
+
+    def reserve(self, seat_numbers: Iterable[int]) -> None:
+        for number in seat_numbers:
+            index = number >> 3
+            if index >= len(self._bits):
+                self._bits.extend(bytes(index - len(self._bits) + 1))
+            self._bits[index] |= 1 << (number & 7)
+
+    def release(self, seat_numbers: Iterable[int]) -> None:
+        for number in seat_numbers:
+            index = number >> 3
+            if index < len(self._bits):
+                self._bits[index] &= ~(1 << (number & 7)) & 0xFF
+
+    def count(self) -> int:
+        return int.from_bytes(self._bits, 'little').bit_count()
+
+    def to_bytes(self) -> bytes:
+        return bytes(self._bits)
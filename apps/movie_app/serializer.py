@@ -1,29 +1,37 @@
 from rest_framework import serializers
-from .models import MovieGenre, Movie, Showtime, Seat, Reservation
+from .models import MovieGenre, Movie, Showtime, Seat, Reservation, Auditorium, SeatAvailability
 from drf_spectacular.utils import extend_schema_field
+from django.db.models import Exists, OuterRef, Q
+from django.utils.functional import cached_property
+from utils.metrics import MeasuredSerializerMixin, MeasuredListSerializer
 
 
-class MovieGenreSerializer(serializers.ModelSerializer):
+class MovieGenreSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = MovieGenre
+        list_serializer_class = MeasuredListSerializer
         exclude = ('created_at', 'updated_at')
         read_only_fields = ('id', 'slug')
         extra_kwargs = {'description': {'required': True}}
 
 
 class MovieShowtimeSerializer(serializers.ModelSerializer):
+    availability = serializers.ChoiceField(choices=SeatAvailability.choices, read_only=True)
+
     class Meta:
         model = Showtime
-        fields = ('id', 'show_date', 'start_time')
+        fields = ('id', 'show_date', 'start_time', 'capacity', 'available_count', 'availability')
 
 
-class MovieSerializer(serializers.ModelSerializer):
+class MovieSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     poster_links = serializers.SerializerMethodField(source='posters')
+    poster_srcsets = serializers.SerializerMethodField(source='posters')
     show_times = MovieShowtimeSerializer(many=True, source='showtimes')
 
     class Meta:
         model = Movie
-        exclude = ('created_at', 'updated_at')
+        list_serializer_class = MeasuredListSerializer
+        exclude = ('created_at', 'updated_at', 'search_document')
         read_only_fields = ('id', 'slug')
 
     @extend_schema_field({
@@ -31,19 +39,85 @@ class MovieSerializer(serializers.ModelSerializer):
         "items": {"type": "string", "format": "uri"}
     })
     def get_poster_links(self, obj):
+        return [self._absolute(image.url) for image in obj.posters.all()]
+
+    @extend_schema_field({
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                "src": {"type": "string", "format": "uri"},
+                "srcset": {"type": "string"},
+                "webp_srcset": {"type": "string"},
+            }
+        }
+    })
+    def get_poster_srcsets(self, obj):
+        srcsets = []
+        for image in obj.posters.all():
+            renditions = sorted(image.renditions.values(), key=lambda rendition: rendition['width'])
+            srcsets.append({
+                'src': self._absolute(image.url),
+                'srcset': ', '.join(
+                    f"{self._absolute(rendition['jpeg']['url'])} {rendition['width']}w" for rendition in renditions
+                ),
+                'webp_srcset': ', '.join(
+                    f"{self._absolute(rendition['webp']['url'])} {rendition['width']}w" for rendition in renditions
+                ),
+            })
+        return srcsets
+
+    def _absolute(self, url):
+        return self._media_host + url if url.startswith('/') else url
+
+    @cached_property
+    def _media_host(self):
+        # Resolved once per serializer, media URLs are only relative when MEDIA_BASE_URL is not set
         request = self.context.get('request')
-        posters = obj.posters.all()
-        posters_url = [request.build_absolute_uri(image.poster.url) for image in posters]
-        return posters_url
+        return request.build_absolute_uri('/')[:-1] if request else ''
+
+
+class MovieFilterSerializer(serializers.Serializer):
+    """Query params of the movie list, every one given narrows the list. Ranges are inclusive."""
+    genre = serializers.SlugField(required=False, help_text='Slug of the genre')
+    language = serializers.CharField(required=False, max_length=100, help_text='Language, case-insensitive')
+    released_from = serializers.DateField(required=False)
+    released_to = serializers.DateField(required=False)
+    min_duration = serializers.IntegerField(required=False, min_value=0, help_text='In minutes')
+    max_duration = serializers.IntegerField(required=False, min_value=0, help_text='In minutes')
+    showing_on = serializers.DateField(required=False, help_text='Only movies with a showtime on this date')
+
+    def validate(self, attrs):
+        for low, high in (('released_from', 'released_to'), ('min_duration', 'max_duration')):
+            if low in attrs and high in attrs and attrs[low] > attrs[high]:
+                raise serializers.ValidationError({high: f'Must not be less than {low}'})
+        return attrs
+
+    def get_filter(self) -> Q:
+        """All the given filters as one condition, so the list stays a single query however many are combined."""
+        data = self.validated_data
+        lookups = {
+            'genre__slug': data.get('genre'),
+            'language__iexact': data.get('language'),
+            'release_date__gte': data.get('released_from'),
+            'release_date__lte': data.get('released_to'),
+            'duration__gte': data.get('min_duration'),
+            'duration__lte': data.get('max_duration'),
+        }
+        condition = Q(**{lookup: value for lookup, value in lookups.items() if value is not None})
+        if 'showing_on' in data:
+            condition &= Q(Exists(Showtime.objects.filter(movie=OuterRef('pk'), show_date=data['showing_on'])))
+        return condition
 
 
-class SeatSerializer(serializers.ModelSerializer):
+class SeatSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Seat
-        fields = ['id', 'seat_number']
+        list_serializer_class = MeasuredListSerializer
+        fields = ['id', 'seat_number', 'row', 'seat_class']
 
 
-class ReservationSerializer(serializers.ModelSerializer):
+class ReservationSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     movie = serializers.SlugRelatedField(slug_field='title', read_only=True)
     user = serializers.SerializerMethodField()
     seats = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
@@ -51,6 +125,7 @@ class ReservationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Reservation
+        list_serializer_class = MeasuredListSerializer
         exclude = ('created_at', 'updated_at')
 
     @extend_schema_field(
@@ -73,3 +148,55 @@ class ReservationCreateSerializer(serializers.Serializer):
         required=True,
         help_text="List of seat IDs"
     )
+
+
+class SeatHoldSerializer(serializers.Serializer):
+    showtime = serializers.PrimaryKeyRelatedField(queryset=Showtime.objects.all(), help_text="Showtime ID")
+    seats = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        help_text="List of seat IDs, extend and release apply to every held seat of the showtime when omitted"
+    )
+
+
+class ScheduleEntrySerializer(serializers.Serializer):
+    movie = serializers.IntegerField(help_text="Movie ID")
+    auditorium = serializers.IntegerField(help_text="Auditorium ID")
+    dates = serializers.ListField(child=serializers.DateField(), allow_empty=False)
+    start_times = serializers.ListField(child=serializers.TimeField(), allow_empty=False)
+
+
+class ShowtimeScheduleSerializer(serializers.Serializer):
+    """Every entry schedules its movie at each of its start times on each of its dates."""
+    MAX_SHOWTIMES = 10000
+
+    showtimes = ScheduleEntrySerializer(many=True, allow_empty=False)
+
+    def validate_showtimes(self, entries):
+        count = sum(len(entry['dates']) * len(entry['start_times']) for entry in entries)
+        if count > self.MAX_SHOWTIMES:
+            raise serializers.ValidationError(f'At most {self.MAX_SHOWTIMES} showtimes can be scheduled at once')
+
+        # Resolved in one query per model instead of one per entry
+        movies = Movie.objects.only('id', 'title', 'duration').in_bulk({entry['movie'] for entry in entries})
+        auditoriums = Auditorium.objects.in_bulk({entry['auditorium'] for entry in entries})
+        errors = [
+            f"{name} with id {entry[field]} does not exist"
+            for entry in entries
+            for field, name, found in (('movie', 'Movie', movies), ('auditorium', 'Auditorium', auditoriums))
+            if entry[field] not in found
+        ]
+        if errors:
+            raise serializers.ValidationError(sorted(set(errors)))
+        for entry in entries:
+            entry['movie'] = movies[entry['movie']]
+            entry['auditorium'] = auditoriums[entry['auditorium']]
+        return entries
+
+    def get_showtimes(self):
+        return [
+            Showtime(movie=entry['movie'], auditorium=entry['auditorium'], show_date=show_date, start_time=start_time)
+            for entry in self.validated_data['showtimes']
+            for show_date in entry['dates']
+            for start_time in entry['start_times']
+        ]
@@ -0,0 +1,437 @@
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Iterable, NamedTuple
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.db.models import Case, Count, Exists, F, OuterRef, QuerySet, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+from django.utils import timezone
+from apps.account_app.models import CustomUser
+from .models import Showtime, Seat, Reservation, SeatHold, Auditorium, SeatAvailability
+from .seatmap import SeatMap
+from .cache import bump_seat_versions, bump_catalogue_generation
+from .events import publish_seat_event
+
+SEAT_MAP_CAS_RETRIES = 10
+SEAT_BATCH_SIZE = 5000
+COUNTER_BATCH_SIZE = 1000
+# Assumed running time of movies without a duration when checking for overlapping showtimes, in minutes
+DEFAULT_MOVIE_DURATION = 120
+
+
+# Sent with ``reservation_ids`` by cancel_reservations inside its transaction, before the reservations are deleted
+reservations_cancelled = Signal()
+
+
+class ScheduleConflictError(Exception):
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        super().__init__('Showtimes overlap with other showtimes of their auditorium')
+
+
+class SeatUnavailableError(Exception):
+    def __init__(self, seat_ids):
+        self.seat_ids = sorted(seat_ids)
+        super().__init__(f"Seats {', '.join(map(str, self.seat_ids))} are not available")
+
+
+class ReservationExistsError(Exception):
+    def __init__(self, reservation_id):
+        self.reservation_id = reservation_id
+        super().__init__('You already have a reservation for this showtime')
+
+
+class SeatMapConflictError(Exception):
+    def __init__(self, showtime_id):
+        self.showtime_id = showtime_id
+        super().__init__(f'The seat map of showtime {showtime_id} kept changing, its seats could not be released')
+
+
+class _ClaimLost(Exception):
+    """A conditional claim matched fewer seats than requested, which ones is only known after the rollback."""
+
+
+def reserve_seats(user: CustomUser, showtime: Showtime, seat_ids: list[int]) -> Reservation:
+    """
+    Book all the requested seats of a showtime in a single transaction.
+
+    Seats are claimed with one conditional UPDATE that only matches rows which are still free and
+    belong to the showtime, so two concurrent buyers can never both get the same seat. With
+    ``SEAT_LOCKING = 'pessimistic'`` the free rows are locked first and rows another booking is
+    working on are skipped, so the conflict is known without waiting for it. Showtimes that carry
+    a seat map are claimed on the bitmap instead. If any seat could not be claimed the whole
+    booking is rolled back.
+    """
+    seat_ids = set(seat_ids)
+    try:
+        with transaction.atomic():
+            if showtime.seat_map is None:
+                _claim_seat_rows(user, showtime, seat_ids)
+            else:
+                _claim_seat_map(user, showtime, seat_ids)
+
+            reservation = Reservation.objects.create(user=user, movie_id=showtime.movie_id, showtime=showtime)
+            Reservation.seats.through.objects.bulk_create(
+                Reservation.seats.through(reservation_id=reservation.id, seat_id=seat_id) for seat_id in seat_ids
+            )
+            adjust_reserved_counts({showtime.id: len(seat_ids)})
+            SeatHold.objects.filter(seat_id__in=seat_ids, user=user).delete()
+            notify_seat_change(showtime.id, 'reserved', seat_ids)
+    except _ClaimLost:
+        # The claim has been rolled back, so whatever is not free now was taken by someone else
+        free = Seat.objects.filter(
+            _not_held_by_others(user), id__in=seat_ids, showtime=showtime, is_reserved=False
+        ).values_list('id', flat=True)
+        raise SeatUnavailableError(seat_ids - set(free) or seat_ids) from None
+    except IntegrityError:
+        # The user_reservation constraint, a user books a showtime at most once
+        reservation_id = Reservation.objects.filter(
+            user=user, movie_id=showtime.movie_id, showtime=showtime
+        ).values_list('id', flat=True).first()
+        if reservation_id is None:
+            raise
+        raise ReservationExistsError(reservation_id) from None
+    return reservation
+
+
+def _not_held_by_others(user: CustomUser) -> Exists:
+    # A correlated NOT EXISTS rather than a join on the hold, with a join Django turns the claim into
+    # UPDATE ... WHERE id IN (SELECT ...) and the is_reserved guard is no longer rechecked on the locked row
+    return ~Exists(SeatHold.objects.filter(seat=OuterRef('pk'), expires_at__gt=timezone.now()).exclude(user=user))
+
+
+def _claim_seat_rows(user: CustomUser, showtime: Showtime, seat_ids: set[int]) -> None:
+    seats = Seat.objects.filter(_not_held_by_others(user), id__in=seat_ids, showtime=showtime, is_reserved=False)
+    if settings.SEAT_LOCKING == 'pessimistic':
+        locked = set(seats.select_for_update(skip_locked=True, of=('self',)).values_list('id', flat=True))
+        if locked != seat_ids:
+            raise SeatUnavailableError(seat_ids - locked)
+        # Still conditional, backends without row locks (SQLite) ignore select_for_update
+        seats = Seat.objects.filter(id__in=locked, is_reserved=False)
+    if seats.update(is_reserved=True) != len(seat_ids):
+        raise _ClaimLost
+
+
+def _claim_seat_map(user: CustomUser, showtime: Showtime, seat_ids: set[int]) -> None:
+    seat_numbers = dict(
+        Seat.objects.filter(_not_held_by_others(user), id__in=seat_ids, showtime=showtime)
+        .values_list('id', 'seat_number')
+    )
+    if len(seat_numbers) != len(seat_ids):
+        raise SeatUnavailableError(seat_ids - set(seat_numbers))
+
+    taken = set(update_seat_map(showtime.id, seat_numbers.values(), reserve=True))
+    if taken:
+        raise SeatUnavailableError(seat_id for seat_id, number in seat_numbers.items() if number in taken)
+    # Seat rows are kept as a compatibility view of the seat map. Still conditional, a booking that went
+    # through the rows (its showtime loaded before the seat map was built) does not show in the bitmap
+    if Seat.objects.filter(id__in=seat_ids, is_reserved=False).update(is_reserved=True) != len(seat_ids):
+        raise _ClaimLost
+
+
+def update_seat_map(showtime_id: int, seat_numbers: Iterable[int], reserve: bool) -> list[int]:
+    """
+    Flip the seat map bits of a showtime with compare-and-set semantics on ``seat_map_version``.
+    Returns the seat numbers that were already reserved, in which case nothing is written.
+
+    A release must not be dropped, the seats would stay reserved in the map while their rows say they
+    are free. It locks the showtime row (so it has to run in a transaction) and raises
+    ``SeatMapConflictError`` if it still loses every retry.
+    """
+    seat_numbers = list(seat_numbers)
+    showtimes = Showtime.objects.all() if reserve else Showtime.objects.select_for_update()
+    for _ in range(SEAT_MAP_CAS_RETRIES):
+        data, version = showtimes.values_list('seat_map', 'seat_map_version').get(pk=showtime_id)
+        seat_map = SeatMap(data)
+        if reserve:
+            taken = seat_map.reserved(seat_numbers)
+            if taken:
+                return taken
+            seat_map.reserve(seat_numbers)
+        else:
+            seat_map.release(seat_numbers)
+
+        updated = Showtime.objects.filter(pk=showtime_id, seat_map_version=version).update(
+            seat_map=seat_map.to_bytes(), seat_map_version=F('seat_map_version') + 1
+        )
+        if updated:
+            return []
+    if not reserve:
+        raise SeatMapConflictError(showtime_id)
+    # Still losing the race after all retries, treat the whole request as unavailable
+    return seat_numbers
+
+
+def cancel_reservations(reservations: QuerySet) -> int:
+    """
+    Cancel every reservation of the queryset in one transaction, e.g. all reservations of a cancelled showtime.
+
+    All their seats are released with a single UPDATE and the reservations are deleted together with their
+    seat links in bulk, instead of saving seat by seat. Returns the number of cancelled reservations.
+
+    The reservations are locked first, so when the same reservation is cancelled twice at once the
+    second call waits and then no longer finds it. Only the seats of reservations this call deletes
+    are released and uncounted, never seats that have been booked again since.
+    """
+    with transaction.atomic():
+        reservation_ids = list(reservations.select_for_update(of=('self',)).values_list('id', flat=True))
+        if not reservation_ids:
+            return 0
+        seats = list(
+            Seat.objects.filter(reservation__in=reservation_ids).values_list('id', 'showtime_id', 'seat_number')
+        )
+        reservations_cancelled.send(sender=Reservation, reservation_ids=reservation_ids)
+        Reservation.objects.filter(id__in=reservation_ids).delete()
+        Seat.objects.filter(id__in=[seat_id for seat_id, _, _ in seats]).update(is_reserved=False)
+
+        released = {}
+        for seat_id, showtime_id, seat_number in seats:
+            released.setdefault(showtime_id, {})[seat_id] = seat_number
+        seat_map_showtimes = Showtime.objects.filter(id__in=released, seat_map__isnull=False).values_list('id', flat=True)
+        for showtime_id in seat_map_showtimes:
+            update_seat_map(showtime_id, released[showtime_id].values(), reserve=False)
+        adjust_reserved_counts({showtime_id: -len(seat_numbers) for showtime_id, seat_numbers in released.items()})
+        for showtime_id, seat_numbers in released.items():
+            notify_seat_change(showtime_id, 'released', seat_numbers.keys())
+    return len(reservation_ids)
+
+
+def adjust_reserved_counts(deltas: dict[int, int]) -> None:
+    """
+    Move ``reserved_count`` of the showtimes by the given deltas with one UPDATE of F-expressions, so
+    concurrent bookings never lose an increment. A showtime that changes its availability (e.g. becomes
+    sold out) invalidates the cached catalogue responses showing it once the transaction commits.
+    """
+    deltas = {showtime_id: delta for showtime_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    Showtime.objects.filter(id__in=deltas).update(reserved_count=F('reserved_count') + Case(
+        *(When(id=showtime_id, then=Value(delta)) for showtime_id, delta in deltas.items()),
+        default=Value(0),
+    ))
+    for showtime_id, available in Showtime.objects.filter(id__in=deltas).values_list('id', 'available_count'):
+        if SeatAvailability.of(available) != SeatAvailability.of(available + deltas[showtime_id]):
+            transaction.on_commit(bump_catalogue_generation)
+            break
+
+
+def reconcile_seat_counters(showtime_ids: Iterable[int] | None = None) -> int:
+    """
+    Recount ``capacity`` and ``reserved_count`` of the showtimes (all of them by default) from their
+    seat rows and fix those that drifted, a batch of showtimes per UPDATE. Returns the number of
+    showtimes that were repaired.
+    """
+    queryset = Showtime.objects.all() if showtime_ids is None else Showtime.objects.filter(id__in=showtime_ids)
+    seats = Seat.objects.filter(showtime=OuterRef('pk')).order_by().values('showtime')
+    capacity = Coalesce(Subquery(seats.annotate(count=Count('id')).values('count')), 0)
+    reserved = Coalesce(Subquery(seats.filter(is_reserved=True).annotate(count=Count('id')).values('count')), 0)
+
+    repaired = 0
+    ids = list(queryset.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(ids), COUNTER_BATCH_SIZE):
+        with transaction.atomic():
+            repaired += Showtime.objects.filter(id__in=ids[start:start + COUNTER_BATCH_SIZE]).alias(
+                actual_capacity=capacity, actual_reserved=reserved,
+            ).exclude(
+                capacity=F('actual_capacity'), reserved_count=F('actual_reserved')
+            ).update(capacity=capacity, reserved_count=reserved)
+    if repaired:
+        bump_catalogue_generation()
+    return repaired
+
+
+def build_seat_maps(showtime_ids: Iterable[int]) -> int:
+    """Switch the given showtimes to seat map storage, seeding the bitmaps from their seat rows."""
+    with transaction.atomic():
+        # Locked while their seats are read, so bookings that already counted their seats have committed.
+        # One still claiming seat rows is caught by the conditional seat row update of _claim_seat_map
+        showtime_ids = list(
+            Showtime.objects.select_for_update().filter(id__in=list(showtime_ids)).values_list('id', flat=True)
+        )
+        reserved = {showtime_id: [] for showtime_id in showtime_ids}
+        for showtime_id, seat_number in Seat.objects.filter(
+                showtime_id__in=showtime_ids, is_reserved=True
+        ).values_list('showtime_id', 'seat_number'):
+            reserved[showtime_id].append(seat_number)
+
+        showtimes = [
+            Showtime(id=showtime_id, seat_map=SeatMap.from_seat_numbers(numbers).to_bytes())
+            for showtime_id, numbers in reserved.items()
+        ]
+        Showtime.objects.bulk_update(showtimes, ['seat_map'], batch_size=1000)
+        Showtime.objects.filter(id__in=showtime_ids).update(seat_map_version=F('seat_map_version') + 1)
+    return len(showtimes)
+
+
+def materialize_seats(showtimes: Iterable[Showtime]) -> int:
+    """
+    Create the seats of the showtimes from their auditorium layouts with a single bulk insert and set
+    their capacity. Showtimes without an auditorium are skipped, returns the number of created seats.
+    """
+    showtimes = [showtime for showtime in showtimes if showtime.auditorium_id]
+    seats = [
+        Seat(showtime=showtime, seat_number=seat_number, row=row, seat_class=seat_class)
+        for showtime in showtimes
+        for seat_number, row, seat_class in showtime.auditorium.seat_layout()
+    ]
+    Seat.objects.bulk_create(seats, batch_size=SEAT_BATCH_SIZE)
+    for showtime in showtimes:
+        showtime.capacity = showtime.auditorium.capacity
+    Showtime.objects.bulk_update(showtimes, ['capacity'], batch_size=COUNTER_BATCH_SIZE)
+    return len(seats)
+
+
+def create_showtimes(showtimes: list[Showtime]) -> list[Showtime]:
+    """Insert the showtimes and all their seats in one transaction, instead of a round trip per seat."""
+    with transaction.atomic():
+        showtimes = Showtime.objects.bulk_create(showtimes)
+        materialize_seats(showtimes)
+        # bulk_create sends no post_save, so the catalogue has to be invalidated here
+        transaction.on_commit(bump_catalogue_generation)
+    return showtimes
+
+
+def schedule_showtimes(showtimes: list[Showtime]) -> list[Showtime]:
+    """
+    Create a whole schedule of showtimes with their seats in one transaction.
+
+    The showtimes must have their movie and auditorium set. They are checked in memory against
+    each other and against the existing schedule of their auditoriums, which is loaded with a
+    single query. If any two overlap, nothing is created and ``ScheduleConflictError`` lists them.
+    """
+    auditorium_ids = {showtime.auditorium_id for showtime in showtimes}
+    dates = [showtime.show_date for showtime in showtimes]
+    with transaction.atomic():
+        # Serializes concurrent uploads for the same auditoriums, so both can't pass the overlap check
+        list(Auditorium.objects.select_for_update().filter(id__in=auditorium_ids).values_list('id'))
+        existing = Showtime.objects.filter(
+            auditorium_id__in=auditorium_ids,
+            # A day either side too, late showtimes can run past midnight into the next day's early ones
+            show_date__range=(min(dates) - timedelta(days=1), max(dates) + timedelta(days=1)),
+        ).values_list('id', 'auditorium_id', 'show_date', 'start_time', 'movie__duration')
+
+        slots = [
+            _Slot.of(auditorium_id, show_date, start_time, duration, f'existing showtime {showtime_id}', is_new=False)
+            for showtime_id, auditorium_id, show_date, start_time, duration in existing
+        ] + [
+            _Slot.of(
+                showtime.auditorium_id, showtime.show_date, showtime.start_time, showtime.movie.duration,
+                f'{showtime.show_date} {showtime.start_time:%H:%M}', is_new=True,
+            )
+            for showtime in showtimes
+        ]
+        conflicts = _find_overlaps(slots)
+        if conflicts:
+            raise ScheduleConflictError(conflicts)
+        return create_showtimes(showtimes)
+
+
+class _Slot(NamedTuple):
+    auditorium_id: int
+    start: int
+    end: int
+    label: str
+    is_new: bool
+
+    @classmethod
+    def of(cls, auditorium_id, show_date, start_time, duration, label, is_new):
+        # Minutes since year 1, so showtimes running past midnight compare correctly with the next day
+        start = (show_date.toordinal() * 24 + start_time.hour) * 60 + start_time.minute
+        return cls(auditorium_id, start, start + (duration or DEFAULT_MOVIE_DURATION), label, is_new)
+
+
+def _find_overlaps(slots: list[_Slot]) -> list[dict]:
+    conflicts = []
+    slots.sort(key=lambda slot: (slot.auditorium_id, slot.start))
+    for auditorium_id, auditorium_slots in groupby(slots, key=lambda slot: slot.auditorium_id):
+        # Compared with the showtime that ends last so far, not just the previous one
+        latest = None
+        for slot in auditorium_slots:
+            if latest and slot.start < latest.end and (slot.is_new or latest.is_new):
+                conflicts.append({'auditorium': auditorium_id, 'showtime': slot.label, 'overlaps': latest.label})
+            if not latest or slot.end > latest.end:
+                latest = slot
+    return conflicts
+
+
+def hold_seats(user: CustomUser, showtime: Showtime, seat_ids: list[int]) -> datetime:
+    """
+    Temporarily lock free seats of a showtime for a user without creating a reservation.
+    Seats the user already holds are extended, the rest are held all-or-nothing.
+    """
+    seat_ids = set(seat_ids)
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=settings.SEAT_HOLD_TTL)
+    with transaction.atomic():
+        # Expired holds are normally reclaimed by the sweeper, only clear the ones in our way here
+        SeatHold.objects.filter(seat_id__in=seat_ids, expires_at__lte=now).delete()
+        free = set(
+            Seat.objects.filter(
+                _not_held_by_others(user), id__in=seat_ids, showtime=showtime, is_reserved=False
+            ).values_list('id', flat=True)
+        )
+        if free != seat_ids:
+            raise SeatUnavailableError(seat_ids - free)
+
+        held = set(
+            SeatHold.objects.filter(seat_id__in=seat_ids, user=user).values_list('seat_id', flat=True)
+        )
+        SeatHold.objects.filter(seat_id__in=held, user=user).update(expires_at=expires_at)
+        try:
+            with transaction.atomic():
+                SeatHold.objects.bulk_create(
+                    SeatHold(seat_id=seat_id, showtime=showtime, user=user, expires_at=expires_at)
+                    for seat_id in seat_ids - held
+                )
+        except IntegrityError:
+            # Someone else grabbed one of the seats between our check and insert
+            raise SeatUnavailableError(seat_ids - held)
+        notify_seat_change(showtime.id, 'held', seat_ids - held)
+    return expires_at
+
+
+def extend_holds(user: CustomUser, showtime: Showtime, seat_ids: list[int] | None = None) -> datetime | None:
+    """Push back the expiry of the user's active holds on a showtime, returns ``None`` if nothing was held."""
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=settings.SEAT_HOLD_TTL)
+    holds = SeatHold.objects.filter(user=user, showtime=showtime, expires_at__gt=now)
+    if seat_ids:
+        holds = holds.filter(seat_id__in=seat_ids)
+    return expires_at if holds.update(expires_at=expires_at) else None
+
+
+def release_holds(user: CustomUser, showtime: Showtime, seat_ids: list[int] | None = None) -> int:
+    holds = SeatHold.objects.filter(user=user, showtime=showtime)
+    if seat_ids:
+        holds = holds.filter(seat_id__in=seat_ids)
+    released = list(holds.values_list('seat_id', flat=True))
+    if released:
+        holds.delete()
+        notify_seat_change(showtime.id, 'released', released)
+    return len(released)
+
+
+def sweep_expired_holds() -> int:
+    """Reclaim every expired hold with a single DELETE."""
+    expired = SeatHold.objects.filter(expires_at__lte=timezone.now())
+    released = {}
+    for showtime_id, seat_id in expired.values_list('showtime_id', 'seat_id'):
+        released.setdefault(showtime_id, []).append(seat_id)
+    expired.delete()
+    for showtime_id, seat_ids in released.items():
+        notify_seat_change(showtime_id, 'released', seat_ids)
+    return sum(map(len, released.values()))
+
+
+def notify_seat_change(showtime_id: int, event_type: str, seat_ids: Iterable[int]) -> None:
+    """
+    Once the current transaction commits, invalidate the cached seat availability of the showtime
+    and push the change to the live seat listeners.
+    """
+    seat_ids = list(seat_ids)
+
+    def notify():
+        bump_seat_versions([showtime_id])
+        publish_seat_event(showtime_id, event_type, seat_ids)
+    transaction.on_commit(notify)
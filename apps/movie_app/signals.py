@@ -0,0 +1,51 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from .cache import bump_catalogue_generation, bump_search_generation
+from .models import MovieGenre, Movie, MoviePoster, Showtime
+from .posters import delete_rendition_files
+from .search import refresh_search_documents
+from .services import materialize_seats
+
+
+@receiver([post_save, post_delete], sender=MovieGenre)
+@receiver([post_save, post_delete], sender=Movie)
+@receiver([post_save, post_delete], sender=MoviePoster)
+@receiver([post_save, post_delete], sender=Showtime)
+def invalidate_catalogue(sender, **kwargs):
+    transaction.on_commit(bump_catalogue_generation)
+
+
+@receiver(post_delete, sender=MoviePoster)
+def delete_poster_renditions(sender, instance, **kwargs):
+    renditions = instance.renditions
+    transaction.on_commit(lambda: delete_rendition_files(renditions))
+
+
+@receiver(post_save, sender=Showtime)
+def create_showtime_seats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.auditorium_id:
+        materialize_seats([instance])
+
+
+@receiver([post_save, post_delete], sender=MovieGenre)
+@receiver([post_save, post_delete], sender=Movie)
+def invalidate_search_index(sender, **kwargs):
+    transaction.on_commit(bump_search_generation)
+
+
+@receiver(post_save, sender=MovieGenre)
+def refresh_genre_search_documents(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        refresh_search_documents(Movie.objects.filter(genre=instance))
+
+
+@receiver(pre_delete, sender=MovieGenre)
+def collect_genre_movies(sender, instance, **kwargs):
+    # Their genre is cleared by the delete, they are gone from the genre afterwards
+    instance._movie_ids = list(instance.movies.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=MovieGenre)
+def refresh_orphaned_search_documents(sender, instance, **kwargs):
+    refresh_search_documents(Movie.objects.filter(id__in=getattr(instance, '_movie_ids', ())))
@@ -1,3 +1,668 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import tempfile
+import threading
+import time as time_module
+from datetime import date, time, timedelta
+from unittest import mock, skipIf
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import (
+    AsyncClient, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APITestCase
+from apps.account_app.models import CustomUser
+from utils import metrics
+from .events import RESYNC, InMemoryBroker, get_broker, publish_seat_event
+from .exports import reservation_rows
+from .models import Auditorium, Movie, MovieGenre, MoviePoster, Reservation, Seat, SeatHold, Showtime
+from . import search
+from .cache import (
+    acached_catalogue_data, cached_catalogue_data, get_catalogue_generation, get_search_generation,
+)
+from .search import MovieSearchIndex, search_movies
+from .services import (
+    ReservationExistsError, ScheduleConflictError, SeatMapConflictError, SeatUnavailableError,
+    build_seat_maps, cancel_reservations, create_showtimes, reserve_seats, schedule_showtimes,
+)
 
-# Create your tests here.
+
+def create_user(phone='09120000001'):
+    return CustomUser.objects.create_user(
+        first_name='Test', last_name='User', phone=phone, email=f'{phone}@example.com', password='pass12345'
+    )
+
+
+def create_showtime(seats=20, show_date=None, start_time=time(20), auditorium=None, movie=None):
+    auditorium = auditorium or Auditorium.objects.create(
+        name=f'Hall {Auditorium.objects.count()}', layout=[{'row': 'A', 'seats': seats, 'seat_class': 'standard'}]
+    )
+    movie = movie or Movie.objects.create(title=f'Movie {Movie.objects.count()}', duration=120)
+    [showtime] = create_showtimes([
+        Showtime(movie=movie, auditorium=auditorium, show_date=show_date or date.today(), start_time=start_time)
+    ])
+    return showtime
+
+
+class ReservationCreateTests(APITestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        self.showtime = create_showtime()
+        self.seat_ids = list(Seat.objects.filter(showtime=self.showtime).order_by('id').values_list('id', flat=True))
+
+    def test_books_seats(self):
+        response = self.client.post(
+            '/api/movie/reservation/', {'showtime': self.showtime.id, 'seats': self.seat_ids[:2]}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Seat.objects.filter(is_reserved=True).count(), 2)
+
+    def test_rejects_seats_that_are_not_a_list(self):
+        response = self.client.post(
+            '/api/movie/reservation/', {'showtime': self.showtime.id, 'seats': '12'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Reservation.objects.exists())
+        self.assertFalse(Seat.objects.filter(is_reserved=True).exists())
+
+
+class SeatClaimTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.other = create_user('09120000002')
+        self.showtime = create_showtime()
+        self.seat_ids = list(Seat.objects.filter(showtime=self.showtime).order_by('id').values_list('id', flat=True))
+
+    def hold(self, seat_id, user, expires_in=60):
+        SeatHold.objects.create(
+            seat_id=seat_id, showtime=self.showtime, user=user,
+            expires_at=timezone.now() + timedelta(seconds=expires_in),
+        )
+
+    def test_claim_is_a_plain_conditional_update(self):
+        # The is_reserved guard has to stay in the WHERE of the UPDATE itself, inside an IN (SELECT ...)
+        # PostgreSQL does not recheck it after waiting for a concurrent booking of the same seat
+        with CaptureQueriesContext(connection) as queries:
+            reserve_seats(self.user, self.showtime, self.seat_ids[:2])
+        [claim] = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('UPDATE "movie_app_seat" SET "is_reserved"')
+        ]
+        self.assertNotIn('IN (SELECT', claim)
+        self.assertIn('NOT EXISTS', claim)
+
+    @override_settings(SEAT_LOCKING='pessimistic')
+    def test_pessimistic_claim_is_a_plain_conditional_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            reserve_seats(self.user, self.showtime, self.seat_ids[:2])
+        [claim] = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('UPDATE "movie_app_seat" SET "is_reserved"')
+        ]
+        self.assertNotIn('IN (SELECT', claim)
+        self.assertIn('"is_reserved"', claim.split('WHERE', 1)[1])
+
+    def test_seats_held_by_others_are_unavailable(self):
+        self.hold(self.seat_ids[0], self.other)
+        with self.assertRaises(SeatUnavailableError) as raised:
+            reserve_seats(self.user, self.showtime, self.seat_ids[:2])
+        self.assertEqual(raised.exception.seat_ids, [self.seat_ids[0]])
+
+    def test_own_and_expired_holds_do_not_block(self):
+        self.hold(self.seat_ids[0], self.user)
+        self.hold(self.seat_ids[1], self.other, expires_in=-60)
+        reserve_seats(self.user, self.showtime, self.seat_ids[:2])
+        self.assertEqual(Seat.objects.filter(is_reserved=True).count(), 2)
+
+
+class CancelReservationTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.showtime = create_showtime()
+        self.seat_ids = list(Seat.objects.filter(showtime=self.showtime).order_by('id').values_list('id', flat=True))
+
+    def test_releases_seats_and_counters(self):
+        reservation = reserve_seats(self.user, self.showtime, self.seat_ids[:3])
+        self.assertEqual(cancel_reservations(Reservation.objects.filter(pk=reservation.pk)), 1)
+        self.showtime.refresh_from_db()
+        self.assertEqual(self.showtime.reserved_count, 0)
+        self.assertFalse(Seat.objects.filter(is_reserved=True).exists())
+
+    def test_cancelling_twice_does_not_release_rebooked_seats(self):
+        reservation = reserve_seats(self.user, self.showtime, self.seat_ids[:2])
+        cancel_reservations(Reservation.objects.filter(pk=reservation.pk))
+        reserve_seats(create_user('09120000002'), self.showtime, self.seat_ids[:2])
+
+        self.assertEqual(cancel_reservations(Reservation.objects.filter(pk=reservation.pk)), 0)
+        self.showtime.refresh_from_db()
+        self.assertEqual(self.showtime.reserved_count, 2)
+        self.assertEqual(Seat.objects.filter(is_reserved=True).count(), 2)
+
+    def test_releases_seat_map(self):
+        build_seat_maps([self.showtime.id])
+        self.showtime.refresh_from_db()
+        reservation = reserve_seats(self.user, self.showtime, self.seat_ids[:2])
+        cancel_reservations(Reservation.objects.filter(pk=reservation.pk))
+        self.showtime.refresh_from_db()
+        self.assertEqual(self.showtime.get_seat_map().count(), 0)
+
+    def test_seat_map_release_is_never_dropped(self):
+        build_seat_maps([self.showtime.id])
+        self.showtime.refresh_from_db()
+        reservation = reserve_seats(self.user, self.showtime, self.seat_ids[:2])
+        # No compare-and-set attempt succeeds, as if other writers kept winning
+        with mock.patch('apps.movie_app.services.SEAT_MAP_CAS_RETRIES', 0):
+            with self.assertRaises(SeatMapConflictError):
+                cancel_reservations(Reservation.objects.filter(pk=reservation.pk))
+        # Rolled back as a whole, the reservation and its seats are untouched
+        self.assertTrue(Reservation.objects.filter(pk=reservation.pk).exists())
+        self.assertEqual(Seat.objects.filter(is_reserved=True).count(), 2)
+
+
+class SeatMapBookingTests(TestCase):
+    def setUp(self):
+        self.showtime = create_showtime()
+        self.seat_ids = list(Seat.objects.filter(showtime=self.showtime).order_by('id').values_list('id', flat=True))
+
+    def test_rows_booked_before_the_seat_map_existed_are_not_booked_again(self):
+        # Loaded before the seat map was built, so this booking goes through the seat rows only
+        stale = Showtime.objects.get(pk=self.showtime.pk)
+        build_seat_maps([self.showtime.id])
+        reserve_seats(create_user(), stale, self.seat_ids[:1])
+
+        self.showtime.refresh_from_db()
+        with self.assertRaises(SeatUnavailableError) as raised:
+            reserve_seats(create_user('09120000002'), self.showtime, self.seat_ids[:2])
+        self.assertEqual(raised.exception.seat_ids, [self.seat_ids[0]])
+        self.assertEqual(Reservation.objects.count(), 1)
+        # The claim on the bitmap was rolled back with the booking
+        self.showtime.refresh_from_db()
+        self.assertEqual(self.showtime.get_seat_map().count(), 0)
+
+    def test_build_seeds_the_seat_map_from_reserved_rows(self):
+        reserve_seats(create_user(), self.showtime, self.seat_ids[:3])
+        self.assertEqual(build_seat_maps([self.showtime.id]), 1)
+        self.showtime.refresh_from_db()
+        self.assertEqual(self.showtime.get_seat_map().count(), 3)
+
+
+class ScheduleShowtimesTests(TestCase):
+    def setUp(self):
+        self.auditorium = Auditorium.objects.create(
+            name='Hall', layout=[{'row': 'A', 'seats': 5, 'seat_class': 'standard'}]
+        )
+        self.movie = Movie.objects.create(title='Long', duration=152)
+        self.day = date(2030, 1, 1)
+
+    def schedule(self, show_date, start_time):
+        return schedule_showtimes([
+            Showtime(movie=self.movie, auditorium=self.auditorium, show_date=show_date, start_time=start_time)
+        ])
+
+    def test_late_showtime_overlaps_next_days_early_one(self):
+        self.schedule(self.day + timedelta(days=1), time(0, 30))
+        with self.assertRaises(ScheduleConflictError):
+            self.schedule(self.day, time(23, 45))
+
+    def test_previous_days_late_showtime_overlaps(self):
+        self.schedule(self.day, time(23, 45))
+        with self.assertRaises(ScheduleConflictError):
+            self.schedule(self.day + timedelta(days=1), time(0, 30))
+
+    def test_back_to_back_showtimes_are_accepted(self):
+        self.schedule(self.day, time(18))
+        self.schedule(self.day, time(20, 32))
+        self.assertEqual(Showtime.objects.count(), 2)
+
+
+class AllOrNothingBookingTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.other = create_user('09120000002')
+        self.showtime = create_showtime()
+        self.seat_ids = list(Seat.objects.filter(showtime=self.showtime).order_by('id').values_list('id', flat=True))
+
+    def assert_booked(self, seat_ids):
+        self.assertEqual(set(Seat.objects.filter(is_reserved=True).values_list('id', flat=True)), set(seat_ids))
+        self.showtime.refresh_from_db()
+        self.assertEqual(self.showtime.reserved_count, len(seat_ids))
+
+    def assert_conflict_leaves_nothing_booked(self):
+        reserve_seats(self.user, self.showtime, self.seat_ids[:2])
+        with self.assertRaises(SeatUnavailableError) as raised:
+            reserve_seats(self.other, self.showtime, self.seat_ids[1:4])
+        self.assertEqual(raised.exception.seat_ids, [self.seat_ids[1]])
+        self.assertFalse(Reservation.objects.filter(user=self.other).exists())
+        self.assert_booked(self.seat_ids[:2])
+
+    def test_partly_taken_request_books_nothing(self):
+        self.assert_conflict_leaves_nothing_booked()
+
+    @override_settings(SEAT_LOCKING='pessimistic')
+    def test_partly_taken_request_books_nothing_with_pessimistic_locking(self):
+        self.assert_conflict_leaves_nothing_booked()
+
+    def test_partly_taken_request_books_nothing_with_seat_map(self):
+        build_seat_maps([self.showtime.id])
+        self.showtime.refresh_from_db()
+        self.assert_conflict_leaves_nothing_booked()
+        self.assertEqual(self.showtime.get_seat_map().count(), 2)
+
+    def test_seats_of_another_showtime_are_refused(self):
+        other_seat = Seat.objects.filter(showtime=create_showtime()).values_list('id', flat=True).first()
+        with self.assertRaises(SeatUnavailableError):
+            reserve_seats(self.user, self.showtime, [self.seat_ids[0], other_seat])
+        self.assertFalse(Seat.objects.filter(is_reserved=True).exists())
+
+    def test_repeat_booking_is_refused_and_rolled_back(self):
+        reservation = reserve_seats(self.user, self.showtime, self.seat_ids[:2])
+        with self.assertRaises(ReservationExistsError) as raised:
+            reserve_seats(self.user, self.showtime, self.seat_ids[2:4])
+        self.assertEqual(raised.exception.reservation_id, reservation.id)
+        self.assert_booked(self.seat_ids[:2])
+
+
+class ReservationExportTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.showtime = create_showtime()
+        self.seat_ids = list(Seat.objects.filter(showtime=self.showtime).order_by('id').values_list('id', flat=True))
+
+    def test_exports_reservations_with_their_seats(self):
+        reservation = reserve_seats(self.user, self.showtime, self.seat_ids[:2])
+        [row] = reservation_rows()
+        self.assertEqual(row['reservation'], reservation.id)
+        self.assertEqual(row['seat_count'], 2)
+        self.assertEqual(row['seats'], 'A1 A2')
+        self.assertEqual(row['user_name'], 'Test User')
+
+    def test_exports_reservations_without_seats(self):
+        reservation = Reservation.objects.create(user=self.user, movie=self.showtime.movie, showtime=self.showtime)
+        [row] = reservation_rows()
+        self.assertEqual((row['reservation'], row['seat_count'], row['seats']), (reservation.id, 0, ''))
+
+    def test_filters_days_on_a_created_at_range(self):
+        reservation = reserve_seats(self.user, self.showtime, self.seat_ids[:1])
+        yesterday = timezone.localdate() - timedelta(days=1)
+        Reservation.objects.filter(pk=reservation.pk).update(created_at=timezone.now() - timedelta(days=1))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(list(reservation_rows(date_from=yesterday, date_to=yesterday))), 1)
+        # A plain range on the column, not a cast of it to a date that no index can serve
+        self.assertNotIn('django_datetime_cast_date', queries[0]['sql'])
+        self.assertEqual(list(reservation_rows(date_from=timezone.localdate())), [])
+
+
+class ShowtimeSaveTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.showtime = create_showtime()
+        build_seat_maps([self.showtime.id])
+        self.showtime.refresh_from_db()
+        self.seat_ids = list(Seat.objects.filter(showtime=self.showtime).order_by('id').values_list('id', flat=True))
+
+    def test_stale_save_keeps_seat_map_and_counters(self):
+        stale = Showtime.objects.get(pk=self.showtime.pk)
+        reserve_seats(self.user, self.showtime, self.seat_ids[:2])
+        stale.start_time = time(21)
+        stale.save()
+
+        self.showtime.refresh_from_db()
+        self.assertEqual(self.showtime.start_time, time(21))
+        self.assertEqual(self.showtime.reserved_count, 2)
+        self.assertEqual(self.showtime.get_seat_map().count(), 2)
+        with self.assertRaises(SeatUnavailableError):
+            reserve_seats(create_user('09120000002'), self.showtime, self.seat_ids[1:3])
+
+    def test_new_showtime_gets_its_capacity(self):
+        self.assertEqual(self.showtime.capacity, 20)
+
+
+class AvailableSeatsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.showtime = create_showtime()
+        self.url = f'/api/movie/showtimes/{self.showtime.id}/available_seats/'
+        self.seat_ids = list(Seat.objects.filter(showtime=self.showtime).order_by('id').values_list('id', flat=True))
+
+    def assertChanged(self, etag):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        return response
+
+    def test_unchanged_poll_is_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 20)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_booking_changes_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_seats(self.user, self.showtime, self.seat_ids[:2])
+        self.assertEqual(len(self.assertChanged(etag).data), 18)
+
+    def test_cancellation_changes_the_etag(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_seats(self.user, self.showtime, self.seat_ids[:2])
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            cancel_reservations(Reservation.objects.all())
+        self.assertEqual(len(self.assertChanged(etag).data), 20)
+
+    def test_lapsed_hold_changes_the_etag(self):
+        SeatHold.objects.create(
+            seat_id=self.seat_ids[0], showtime=self.showtime, user=self.user,
+            expires_at=timezone.now() + timedelta(seconds=1),
+        )
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data), 19)
+        # No sweep has run, the cached availability must not outlive the hold
+        time_module.sleep(1.1)
+        self.assertEqual(len(self.assertChanged(response['ETag']).data), 20)
+
+    def test_version_expires_with_the_payload(self):
+        with mock.patch('apps.movie_app.cache.cache.add', wraps=cache.add) as add:
+            self.client.get(self.url)
+        self.assertEqual(add.call_args.kwargs['timeout'], settings.SEAT_AVAILABILITY_CACHE_TIMEOUT)
+
+
+class CatalogueCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.showtime = create_showtime()
+        self.movie = self.showtime.movie
+
+    def assertBumpedOnCommit(self, save):
+        generation = get_catalogue_generation()
+        with self.captureOnCommitCallbacks(execute=True):
+            save()
+            self.assertEqual(get_catalogue_generation(), generation)
+        self.assertGreater(get_catalogue_generation(), generation)
+
+    def test_movie_save_bumps_on_commit(self):
+        self.assertBumpedOnCommit(self.movie.save)
+
+    def test_showtime_save_bumps_on_commit(self):
+        self.assertBumpedOnCommit(self.showtime.save)
+
+    def test_poster_save_bumps_on_commit(self):
+        image = io.BytesIO()
+        Image.new('RGB', (4, 6)).save(image, 'PNG')
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            poster = MoviePoster.objects.create(
+                movie=self.movie, poster=SimpleUploadedFile('poster.png', image.getvalue())
+            )
+            # The file is unchanged, so this save schedules no renditions
+            self.assertBumpedOnCommit(poster.save)
+
+    def test_cached_list_is_refreshed_after_commit(self):
+        self.assertEqual(self.client.get('/api/movie/list/').status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            self.client.get('/api/movie/list/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Movie.objects.create(title='Another', duration=90)
+        titles = [movie['title'] for movie in self.client.get('/api/movie/list/').data['results']]
+        self.assertIn('Another', titles)
+
+
+class CatalogueStampedeTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get('/api/movie/list/', {'page_size': 5})
+        self.builds = 0
+
+    def build(self):
+        self.builds += 1
+        time_module.sleep(0.3)
+        return {'results': []}
+
+    def test_concurrent_misses_build_once(self):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cached_catalogue_data(self.request, 'test', self.build)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(results, [{'results': []}] * 5)
+
+    async def test_concurrent_async_misses_build_once(self):
+        async def build():
+            self.builds += 1
+            await asyncio.sleep(0.3)
+            return {'results': []}
+
+        results = await asyncio.gather(*(acached_catalogue_data(self.request, 'test', build) for _ in range(5)))
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(results, [{'results': []}] * 5)
+
+
+class SeatEventsTests(TestCase):
+    def setUp(self):
+        self.showtime = create_showtime()
+        self.url = f'/api/movie/showtimes/{self.showtime.id}/events/'
+
+    def test_refused_under_wsgi(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+    async def test_streams_seat_changes(self):
+        response = await AsyncClient().get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+
+        event = asyncio.ensure_future(anext(stream))
+        # The stream starts listening once it is asked for its next event
+        while self.showtime.id not in get_broker()._listeners:
+            await asyncio.sleep(0.01)
+        publish_seat_event(self.showtime.id, 'reserved', [3, 1])
+        self.assertEqual(await event, b'data: {"type": "reserved", "seats": [1, 3]}\n\n')
+
+        # A client disconnecting cancels the stream while it waits, which unsubscribes it
+        waiting = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertNotIn(self.showtime.id, get_broker()._listeners)
+
+    async def test_unknown_showtime(self):
+        response = await AsyncClient().get('/api/movie/showtimes/0/events/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class InMemoryBrokerTests(SimpleTestCase):
+    async def listen(self, broker, showtime_id=1):
+        """A listener of the showtime and its pending first event, once it is subscribed."""
+        subscribed = len(broker._listeners.get(showtime_id, ()))
+        listener = broker.listen(showtime_id)
+        first = asyncio.ensure_future(anext(listener))
+        while len(broker._listeners.get(showtime_id, ())) == subscribed:
+            await asyncio.sleep(0.01)
+        return listener, first
+
+    async def test_fans_out_to_every_listener(self):
+        broker = InMemoryBroker()
+        (one, first_one), (two, first_two) = await self.listen(broker), await self.listen(broker)
+        broker.publish(1, {'type': 'held', 'seats': [5]})
+        for first in (first_one, first_two):
+            self.assertEqual(json.loads(await first), {'type': 'held', 'seats': [5]})
+        await one.aclose()
+        await two.aclose()
+        self.assertEqual(broker._listeners, {})
+
+    async def test_slow_listener_is_asked_to_resync(self):
+        broker = InMemoryBroker()
+        broker.queue_size = 2
+        listener, first = await self.listen(broker)
+        for seat in range(5):
+            broker.publish(1, {'type': 'held', 'seats': [seat]})
+        # The backlog that did not fit the queue is dropped for a single resync
+        self.assertEqual(await first, RESYNC)
+        [(_, queue)] = broker._listeners[1]
+        self.assertTrue(queue.empty())
+        await listener.aclose()
+
+    async def test_heartbeat_when_idle(self):
+        with mock.patch('apps.movie_app.events.HEARTBEAT_INTERVAL', 0.01):
+            listener, first = await self.listen(InMemoryBroker())
+            self.assertIsNone(await first)
+            await listener.aclose()
+
+
+class MovieSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        scifi = MovieGenre.objects.create(name='Science Fiction', description='Space')
+        cls.terminator = Movie.objects.create(
+            title='The Terminator', director='James Cameron', genre=scifi, language='English',
+            description='A cyborg assassin is sent back in time',
+        )
+        cls.titanic = Movie.objects.create(
+            title='Titanic', director='James Cameron', language='English',
+            description='A romance aboard the doomed ship, no terminator in sight',
+        )
+        cls.alien = Movie.objects.create(title='Alien', director='Ridley Scott', genre=scifi, language='English')
+
+    def find(self, query, limit=10):
+        return MovieSearchIndex.build(generation=0, with_postings=True).search(query, limit)
+
+    def test_title_match_ranks_above_description_match(self):
+        self.assertEqual(self.find('terminator'), [self.terminator.id, self.titanic.id])
+
+    def test_prefix_match(self):
+        self.assertEqual(self.find('termin')[0], self.terminator.id)
+        self.assertCountEqual(self.find('sci'), [self.alien.id, self.terminator.id])
+
+    @skipIf(search.process is None, 'typo tolerance needs RapidFuzz')
+    def test_typo_match(self):
+        self.assertEqual(self.find('termnator')[0], self.terminator.id)
+        self.assertCountEqual(self.find('camerom'), [self.terminator.id, self.titanic.id])
+
+    def test_every_term_has_to_match(self):
+        self.assertEqual(self.find('cameron ship'), [self.titanic.id])
+        self.assertEqual(self.find('cameron fiction'), [self.terminator.id])
+        self.assertEqual(self.find('alien cameron'), [])
+        self.assertEqual(self.find('zzzz'), [])
+
+    def test_limit(self):
+        self.assertEqual(len(self.find('english', limit=2)), 2)
+
+    def test_endpoint(self):
+        with mock.patch.object(search, '_index', None):
+            response = self.client.get('/api/movie/list/search/', {'q': 'ridley'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual([movie['id'] for movie in response.json()], [self.alien.id])
+        response = self.client.get('/api/movie/list/search/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MovieSearchIndexRebuildTests(TransactionTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(search, '_index', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def wait_for_rebuild(self):
+        for _ in range(500):
+            if search._index.generation == get_search_generation() and not search._rebuilding:
+                return
+            time_module.sleep(0.01)
+        self.fail('The search index was not rebuilt')
+
+    def test_changes_are_picked_up_by_a_background_rebuild(self):
+        Movie.objects.create(title='Alpha')
+        self.assertEqual(len(search_movies('alpha', 10)), 1)
+
+        genre = MovieGenre.objects.create(name='Noir', description='Dark')
+        movie = Movie.objects.create(title='Beta', genre=genre)
+        # The previous index keeps serving while the new one is built
+        self.assertEqual(search_movies('beta', 10), [])
+        self.wait_for_rebuild()
+        self.assertEqual(search_movies('beta', 10), [movie.id])
+
+        genre.name = 'Thriller'
+        genre.save()
+        search.get_search_index()
+        self.wait_for_rebuild()
+        self.assertEqual(search_movies('thriller', 10), [movie.id])
+        self.assertEqual(search_movies('noir', 10), [])
+
+
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.showtime = create_showtime()
+        self.url = f'/api/movie/showtimes/{self.showtime.id}/available_seats/'
+        self.registry = metrics.MetricsRegistry()
+        patcher = mock.patch.object(metrics, 'registry', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_request_updates_view_counters(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        query_count = len(queries)
+        self.client.get('/api/movie/showtimes/0/available_seats/')
+
+        stats = self.registry._views['ShowTimeViewSet.available_seats']
+        self.assertEqual(dict(stats.requests), {('GET', 200): 1, ('GET', 404): 1})
+        self.assertEqual(sum(stats.latency_buckets), 2)
+        self.assertGreater(stats.latency_sum, 0)
+        # The 404 only looks up the showtime
+        self.assertEqual(stats.queries, query_count + 1)
+        self.assertGreater(stats.serialize_time, 0)
+        rendered = self.registry.render()
+        self.assertIn(
+            'api_requests_total{view="ShowTimeViewSet.available_seats",method="GET",status="200"} 1', rendered
+        )
+        self.assertIn('api_request_duration_seconds_count{view="ShowTimeViewSet.available_seats"} 2', rendered)
+
+    def test_unrouted_requests_are_not_recorded(self):
+        self.client.get('/api/unknown/')
+        self.assertEqual(self.registry._views, {})
+
+    def test_fingerprint_groups_repeated_queries(self):
+        self.assertEqual(
+            metrics.fingerprint('SELECT "a"."id", "a"."name" FROM "a" WHERE "a"."id" = 12 AND "a"."name" = \'x\''),
+            'SELECT ... FROM "a" WHERE "a"."id" = ? AND "a"."name" = ?',
+        )
+        self.assertEqual(
+            metrics.fingerprint('SELECT "id" FROM "a" WHERE "id" IN (%s, %s, %s)'),
+            metrics.fingerprint('SELECT "id" FROM "a" WHERE "id" IN (%s)'),
+        )
+
+    @override_settings(SLOW_REQUEST_THRESHOLD=0)
+    def test_slow_request_log_groups_queries(self):
+        with self.assertLogs('utils.metrics', 'WARNING') as logs:
+            self.client.get(self.url)
+        [message] = logs.output
+        self.assertIn('(ShowTimeViewSet.available_seats)', message)
+        self.assertRegex(message, r'Most frequent queries: 1x SELECT \.\.\. FROM "movie_app_\w+" ')
+
+    def test_metrics_are_only_served_to_internal_ips(self):
+        self.client.get(self.url)
+        with override_settings(INTERNAL_IPS=['10.0.0.1']):
+            response = self.client.get('/internal/metrics/', REMOTE_ADDR='10.0.0.1')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn(b'view="ShowTimeViewSet.available_seats"', response.content)
+            self.assertEqual(
+                self.client.get('/internal/metrics/', REMOTE_ADDR='10.0.0.2').status_code,
+                status.HTTP_404_NOT_FOUND,
+            )
@@ -1,5 +1,6 @@
-from . import views
+from . import views, async_views
 from rest_framework.routers import SimpleRouter
+from django.urls import path
 
 app_name = 'movie'
 
@@ -9,4 +10,10 @@ router.register('genre', views.MovieGenreViewSet, basename='genre')
 router.register('showtimes', views.ShowTimeViewSet, basename='showtimes')
 router.register('reservation', views.ReservationViewSet, basename='reservation')
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    path('showtimes/<int:pk>/events/', views.seat_events, name='seat_events'),
+    path('async/list/', async_views.movie_list, name='async_movie_list'),
+    path('async/list/<int:pk>/', async_views.movie_detail, name='async_movie_detail'),
+    path('async/genre/', async_views.genre_list, name='async_genre_list'),
+    path('async/showtimes/<int:pk>/available_seats/', async_views.available_seats, name='async_available_seats'),
+]
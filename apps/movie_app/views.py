@@ -1,15 +1,49 @@
 from rest_framework.viewsets import ViewSet
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import status, serializers
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
+from django.db.models import Prefetch, Exists, Min, OuterRef, Q
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
 from drf_spectacular.utils import extend_schema
-from .serializer import MovieGenreSerializer, MovieSerializer, SeatSerializer, ReservationSerializer
+from utils.pagination import IdCursorPagination, CreatedAtCursorPagination
+from .serializer import (
+    MovieGenreSerializer, MovieSerializer, SeatSerializer, ReservationSerializer, SeatHoldSerializer,
+    ShowtimeScheduleSerializer, MovieFilterSerializer,
+)
 from .permissions import IsAdminOrReadOnly, ReservationCustomPermission
-from django.core.validators import ValidationError
 from django.utils import timezone
-from . import decorators
-from.models import MovieGenre, Movie, Showtime, Seat, Reservation
+from django.utils.dateparse import parse_date
+from . import decorators, cache
+from .services import (
+    reserve_seats, cancel_reservations, hold_seats, extend_holds, release_holds, schedule_showtimes,
+    SeatUnavailableError, ScheduleConflictError, ReservationExistsError,
+)
+from .events import get_broker
+from .exports import EXPORT_FORMATS, reservation_rows, export_lines
+from .search import search_movies
+from.models import MovieGenre, Movie, MoviePoster, Showtime, Seat, SeatHold, Reservation
+
+MAX_SCHEDULE_DAYS = 31
+DEFAULT_SEARCH_RESULTS = 20
+MAX_SEARCH_RESULTS = 50
+
+POSTERS_PREFETCH = Prefetch('posters', queryset=MoviePoster.objects.only('id', 'movie_id', 'url', 'renditions'))
+# What MovieShowtimeSerializer shows, the seat map blobs stay in the database
+SHOWTIME_FIELDS = ('id', 'movie_id', 'show_date', 'start_time', 'capacity', 'reserved_count', 'available_count')
+SHOWTIMES_PREFETCH = Prefetch('showtimes', queryset=Showtime.objects.only(*SHOWTIME_FIELDS))
+
+
+def build_movie_page(request, view=None, filters: Q | None = None) -> dict:
+    """One page of the movie list, shared by the sync and async list endpoints."""
+    queryset = Movie.objects.prefetch_related(POSTERS_PREFETCH, SHOWTIMES_PREFETCH).filter(filters or Q())
+    paginator = IdCursorPagination()
+    page = paginator.paginate_queryset(queryset, request, view=view)
+    serializer = MovieSerializer(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data).data
 
 
 @extend_schema(tags=['Movie Genre'])
@@ -18,9 +52,12 @@ class MovieGenreViewSet(ViewSet):
 
     @decorators.genre_list_decorator
     def list(self, request):
-        queryset = MovieGenre.objects.filter(is_active=True)
-        serializer = MovieGenreSerializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        def build():
+            queryset = MovieGenre.objects.filter(is_active=True)
+            return MovieGenreSerializer(queryset, many=True).data
+
+        data = cache.cached_catalogue_data(request, 'genre-list', build)
+        return Response(data, status=status.HTTP_200_OK)
 
     @decorators.genre_retrieve_decorator
     def retrieve(self, request, pk=None):
@@ -57,16 +94,38 @@ class MovieGenreViewSet(ViewSet):
 @extend_schema(tags=['Movie'])
 class MovieViewSet(ViewSet):
     permission_classes = [IsAdminOrReadOnly]
+    pagination_class = IdCursorPagination
 
     @decorators.movie_list_decorator
     def list(self, request):
-        queryset = Movie.objects.prefetch_related('posters', 'showtimes').all()
-        serializer = MovieSerializer(queryset, many=True, context={'request': request})
+        filters = MovieFilterSerializer(data=request.query_params)
+        if not filters.is_valid():
+            return Response(filters.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = cache.cached_catalogue_data(
+            request, 'movie-list', lambda: build_movie_page(request, view=self, filters=filters.get_filter())
+        )
+        return Response(data, status=status.HTTP_200_OK)
+
+    @decorators.movie_search_decorator
+    def search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Please provide a search query in q'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', DEFAULT_SEARCH_RESULTS)), MAX_SEARCH_RESULTS)
+        except ValueError:
+            limit = DEFAULT_SEARCH_RESULTS
+
+        movie_ids = search_movies(query, max(limit, 1))
+        movies = Movie.objects.prefetch_related(POSTERS_PREFETCH, SHOWTIMES_PREFETCH).in_bulk(movie_ids)
+        # Movies deleted since the index was built are skipped
+        ranked = [movies[movie_id] for movie_id in movie_ids if movie_id in movies]
+        serializer = MovieSerializer(ranked, many=True, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @decorators.movie_retrieve_decorator
     def retrieve(self, request, pk=None):
-        queryset = get_object_or_404(Movie, pk=pk)
+        queryset = get_object_or_404(Movie.objects.prefetch_related(POSTERS_PREFETCH, SHOWTIMES_PREFETCH), pk=pk)
         serializer = MovieSerializer(queryset, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -97,39 +156,124 @@ class MovieViewSet(ViewSet):
 
     @decorators.movie_showtime_decorator
     def get_movie_with_showtimes(self, request):
-        date = request.query_params.get('date', None)
-        if date:
-            try:
-                movies = Movie.objects.filter(showtimes__show_date=date).prefetch_related('posters', 'showtimes').distinct()
-                serializer = MovieSerializer(movies, many=True, context={'request': request})
-                return Response(serializer.data)
-            except ValidationError:
-                pass
-        return Response(
-            {"error": "Please provide a valid date in the format YYYY-MM-DD"},
-            status=status.HTTP_400_BAD_REQUEST
-        )
+        try:
+            if 'date' in request.query_params:
+                start_date = end_date = parse_date(request.query_params['date'])
+            else:
+                start_date = parse_date(request.query_params.get('start_date', ''))
+                end_date = parse_date(request.query_params.get('end_date', ''))
+        except ValueError:
+            start_date = end_date = None
+        if start_date is None or end_date is None:
+            return Response(
+                {"error": "Please provide a valid date (or start_date and end_date) in the format YYYY-MM-DD"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 0 <= (end_date - start_date).days < MAX_SCHEDULE_DAYS:
+            return Response(
+                {"error": f"end_date must be on or after start_date and at most {MAX_SCHEDULE_DAYS} days later"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        def build():
+            showtimes = Showtime.objects.filter(show_date__range=(start_date, end_date))
+            movies = Movie.objects.filter(Exists(showtimes.filter(movie=OuterRef('pk')))).prefetch_related(
+                POSTERS_PREFETCH,
+                # Only the showtimes of the requested dates, not every showtime of the movie
+                Prefetch(
+                    'showtimes',
+                    queryset=showtimes.order_by('show_date', 'start_time').only(*SHOWTIME_FIELDS)
+                ),
+            )
+            return MovieSerializer(movies, many=True, context={'request': request}).data
+
+        data = cache.cached_catalogue_data(request, 'movie-showtime', build)
+        return Response(data, status=status.HTTP_200_OK)
 
 
 @extend_schema(tags=['ShowTime'])
 class ShowTimeViewSet(ViewSet):
+    permission_classes = [IsAdminOrReadOnly]
+
+    @decorators.showtime_schedule_decorator
+    def schedule(self, request):
+        serializer = ShowtimeScheduleSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            showtimes = schedule_showtimes(serializer.get_showtimes())
+        except ScheduleConflictError as e:
+            return Response({'error': str(e), 'conflicts': e.conflicts}, status=status.HTTP_409_CONFLICT)
+        return Response(
+            {'response': f'{len(showtimes)} showtimes created', 'showtimes': [showtime.id for showtime in showtimes]},
+            status=status.HTTP_201_CREATED
+        )
+
     @decorators.available_seats_decorator
     def available_seats(self, request, pk=None):
-        showtime = get_object_or_404(Showtime, pk=pk)
-        available_seats = Seat.objects.filter(showtime=showtime, is_reserved=False).defer('showtime')
+        try:
+            showtime_id = int(pk)
+        except ValueError:
+            raise Http404
+
+        # Unchanged polls are answered from the version counter alone, without touching the database
+        version = cache.get_seat_version(showtime_id)
+        if version is not None:
+            etag = f'"{showtime_id}-{version}"'
+            if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+            payload = cache.get_seat_availability(showtime_id, version)
+            if payload is not None:
+                return Response(payload, status=status.HTTP_200_OK, headers={'ETag': etag})
+
+        showtime = get_object_or_404(Showtime, pk=showtime_id)
+        version = cache.ensure_seat_version(showtime_id)
+        now = timezone.now()
+        available_seats = Seat.objects.filter(showtime=showtime, is_reserved=False).exclude(
+            hold__expires_at__gt=now
+        ).defer('showtime')
         serializer = SeatSerializer(available_seats, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        next_expiry = SeatHold.objects.filter(showtime=showtime, expires_at__gt=now).aggregate(
+            next_expiry=Min('expires_at')
+        )['next_expiry']
+        cache.set_seat_availability(showtime_id, version, serializer.data, expires_at=next_expiry)
+        return Response(serializer.data, status=status.HTTP_200_OK, headers={'ETag': f'"{showtime_id}-{version}"'})
 
 
 @extend_schema(tags=['Reservation'], responses=ReservationSerializer)
 class ReservationViewSet(ViewSet):
     permission_classes = [IsAuthenticated, ReservationCustomPermission]
+    pagination_class = CreatedAtCursorPagination
 
     @decorators.reservation_list_decoration
     def list(self, request):
         queryset = Reservation.objects.select_related('showtime', 'user', 'movie').prefetch_related('seats').all()
-        serializer = ReservationSerializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = ReservationSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @decorators.reservation_export_decorator
+    def export(self, request):
+        export_format = request.query_params.get('output', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'error': f"output must be one of {', '.join(EXPORT_FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            date_from = parse_date(request.query_params.get('date_from', ''))
+            date_to = parse_date(request.query_params.get('date_to', ''))
+        except ValueError:
+            return Response(
+                {'error': 'date_from and date_to must be dates in the format YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rows = reservation_rows(date_from=date_from, date_to=date_to)
+        response = StreamingHttpResponse(export_lines(rows, export_format), content_type=EXPORT_FORMATS[export_format])
+        response['Content-Disposition'] = f'attachment; filename="reservations.{export_format}"'
+        return response
 
     @decorators.reservation_create_decorator
     def create(self, request):
@@ -140,30 +284,34 @@ class ReservationViewSet(ViewSet):
             return Response({'error': 'At least a showtime must be selected'}, status=status.HTTP_400_BAD_REQUEST)
         if not seat_ids:
             return Response({"error": "At least one seat must be selected."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # A string is rejected rather than read digit by digit as seat ids
+            seat_ids = serializers.ListField(child=serializers.IntegerField()).run_validation(seat_ids)
+        except ValidationError:
+            return Response({"error": "Seats must be a list of seat IDs."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
             showtime = Showtime.objects.get(id=showtime_id)
-        except Showtime.DoesNotExist:
-            return Response({'error': f'showtime with id {showtime_id} does not exists'})
+        except (Showtime.DoesNotExist, ValueError, TypeError):
+            return Response(
+                {'error': f'showtime with id {showtime_id} does not exists'},
+                status=status.HTTP_404_NOT_FOUND
+            )
 
-        reservation = Reservation.objects.create(
-            user=request.user,
-            movie=showtime.movie,
-            showtime=showtime,
-        )
-        for seat_id in seat_ids:
-            try:
-                seat = Seat.objects.get(id=seat_id)
-                seat.is_reserved = True
-                seat.save()
-            except Seat.DoesNotExist:
-                return Response({'error': f'seat with id {seat_id} does not exists'})
-            reservation.seats.add(seat)
+        try:
+            reserve_seats(user=request.user, showtime=showtime, seat_ids=seat_ids)
+        except SeatUnavailableError as e:
+            return Response(
+                {'error': str(e), 'seats': e.seat_ids},
+                status=status.HTTP_409_CONFLICT
+            )
+        except ReservationExistsError as e:
+            return Response({'error': str(e), 'reservation': e.reservation_id}, status=status.HTTP_409_CONFLICT)
         return Response({'response': 'Created successfully'}, status=status.HTTP_201_CREATED)
 
     @decorators.reservation_cancel_decorator
     def cancel_reservation(self, request, pk=None):
-        reservation = get_object_or_404(Reservation, pk=pk, user=request.user)
+        reservation = get_object_or_404(Reservation.objects.select_related('showtime'), pk=pk, user=request.user)
         self.check_object_permissions(request, reservation)
         if reservation.showtime.show_date < timezone.now().date():
             return Response(
@@ -171,10 +319,80 @@ class ReservationViewSet(ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        for seat in reservation.seats.all():
-            seat.is_reserved = False
-            seat.save()
+        if not cancel_reservations(Reservation.objects.filter(pk=reservation.pk)):
+            # Cancelled by a concurrent request in the meantime
+            raise Http404
+        return Response({"response": "Reservation canceled successfully."}, status=status.HTTP_204_NO_CONTENT)
+
+    @decorators.seat_hold_decorator
+    def hold(self, request):
+        serializer = SeatHoldSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        seat_ids = serializer.validated_data.get('seats')
+        if not seat_ids:
+            return Response({"error": "At least one seat must be selected."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            expires_at = hold_seats(
+                user=request.user, showtime=serializer.validated_data['showtime'], seat_ids=seat_ids
+            )
+        except SeatUnavailableError as e:
+            return Response({'error': str(e), 'seats': e.seat_ids}, status=status.HTTP_409_CONFLICT)
+        return Response({'expires_at': expires_at}, status=status.HTTP_201_CREATED)
+
+    @decorators.seat_hold_extend_decorator
+    def extend_hold(self, request):
+        serializer = SeatHoldSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        reservation.delete()
+        expires_at = extend_holds(
+            user=request.user,
+            showtime=serializer.validated_data['showtime'],
+            seat_ids=serializer.validated_data.get('seats'),
+        )
+        if expires_at is None:
+            return Response({'error': 'There are no active holds to extend'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'expires_at': expires_at}, status=status.HTTP_200_OK)
 
-        return Response({"response": "Reservation canceled successfully."}, status=status.HTTP_204_NO_CONTENT)
+    @decorators.seat_hold_release_decorator
+    def release_hold(self, request):
+        serializer = SeatHoldSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        release_holds(
+            user=request.user,
+            showtime=serializer.validated_data['showtime'],
+            seat_ids=serializer.validated_data.get('seats'),
+        )
+        return Response({'response': 'Released successfully'}, status=status.HTTP_204_NO_CONTENT)
+
+
+async def seat_events(request, pk):
+    """
+    Server-Sent Events stream of seat changes of a showtime, so clients don't have to poll available_seats.
+    Needs to be served by an ASGI server (see MovieReservation/asgi.py), each event is
+    ``{"type": "reserved" | "held" | "released", "seats": [seat IDs]}`` or ``{"type": "resync"}``
+    when the client fell behind and should refetch the available seats.
+    """
+    if not isinstance(request, ASGIRequest):
+        # A WSGI server reads a streaming response with an async iterator into memory first, this one
+        # never ends, so it would pin a worker thread and pile up heartbeats forever
+        return JsonResponse(
+            {'error': 'Live seat events need an ASGI server, poll available_seats instead'},
+            status=status.HTTP_501_NOT_IMPLEMENTED,
+        )
+    if not await Showtime.objects.filter(pk=pk).aexists():
+        raise Http404
+    response = StreamingHttpResponse(_seat_event_stream(pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def _seat_event_stream(showtime_id):
+    yield 'retry: 3000\n\n'
+    async for data in get_broker().listen(showtime_id):
+        yield f'data: {data}\n\n' if data is not None else ': keep-alive\n\n'
@@ -15,7 +15,8 @@ def custom_decorator(
         detail: bool = False,
         description: str | None = None,
         examples: Sequence[OpenApiExample] | None = None,
-        parameters: Sequence[OpenApiParameter] | None = None
+        parameters: Sequence[OpenApiParameter] | None = None,
+        **kwargs: Any
 ):
     def decorator(func):
         @extend_schema(
@@ -27,7 +28,7 @@ def custom_decorator(
             examples=examples,
             parameters=parameters,
         )
-        @action(methods=methods, url_path=url_path, detail=detail, url_name=url_name)
+        @action(methods=methods, url_path=url_path, detail=detail, url_name=url_name, **kwargs)
         @wraps(func)  # Ensures the wrapper keeps the original function's metadata
         def wrapper(*args, **kwargs):
             return func(*args, **kwargs)
@@ -0,0 +1,244 @@
+"""
+Lightweight per-view request metrics, cheap enough to keep on in production.
+
+``MetricsMiddleware`` records for every request its total latency, number and time of DB queries,
+serializer time and response render time, aggregated per view action (e.g. ``MovieViewSet.list``).
+They are exposed in the Prometheus text format by ``metrics_view`` to ``INTERNAL_IPS`` only.
+Metrics live in the memory of each process, so every worker is scraped (or reports) on its own.
+"""
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+from rest_framework.serializers import ListSerializer
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('view', 'queries', 'db_time', 'serialize_time', 'render_time')
+
+    def __init__(self):
+        self.view = None
+        self.queries = []
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+
+
+class ViewMetrics:
+    __slots__ = ('requests', 'latency_buckets', 'latency_sum', 'queries', 'db_time', 'serialize_time', 'render_time')
+
+    def __init__(self):
+        self.requests = Counter()
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def record(self, view, method, status_code, latency, metrics):
+        with self._lock:
+            stats = self._views.get(view)
+            if stats is None:
+                stats = self._views[view] = ViewMetrics()
+            stats.requests[method, status_code] += 1
+            stats.latency_buckets[bisect_left(LATENCY_BUCKETS, latency)] += 1
+            stats.latency_sum += latency
+            stats.queries += len(metrics.queries)
+            stats.db_time += metrics.db_time
+            stats.serialize_time += metrics.serialize_time
+            stats.render_time += metrics.render_time
+
+    def render(self) -> str:
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = [
+                '# HELP api_requests_total Requests per view action, method and status.',
+                '# TYPE api_requests_total counter',
+            ]
+            for view, stats in views:
+                for (method, status_code), count in sorted(stats.requests.items()):
+                    lines.append(f'api_requests_total{{view="{view}",method="{method}",status="{status_code}"}} {count}')
+
+            lines += [
+                '# HELP api_request_duration_seconds Total latency of requests per view action.',
+                '# TYPE api_request_duration_seconds histogram',
+            ]
+            for view, stats in views:
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), stats.latency_buckets):
+                    cumulative += count
+                    lines.append(f'api_request_duration_seconds_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+                lines.append(f'api_request_duration_seconds_sum{{view="{view}"}} {stats.latency_sum:.6f}')
+                lines.append(f'api_request_duration_seconds_count{{view="{view}"}} {cumulative}')
+
+            for name, attribute, description in (
+                ('api_db_queries_total', 'queries', 'DB queries run by requests per view action.'),
+                ('api_db_duration_seconds_total', 'db_time', 'Time spent in DB queries per view action.'),
+                ('api_serialize_duration_seconds_total', 'serialize_time', 'Time spent in serializers per view action.'),
+                ('api_render_duration_seconds_total', 'render_time', 'Time spent rendering responses per view action.'),
+            ):
+                lines += [f'# HELP {name} {description}', f'# TYPE {name} counter']
+                lines += [f'{name}{{view="{view}"}} {getattr(stats, attribute):g}' for view, stats in views]
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.queries.append(sql)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # Installed on every connection instead of per request, so the queries that async views run on
+    # sync_to_async threads are counted too, the request they belong to travels in the context var
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def view_name(view_func, method: str) -> str:
+    """``ViewSet.action`` for DRF views, the dotted path of the function otherwise."""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    action = (getattr(view_func, 'actions', None) or {}).get(method.lower(), method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+_SELECT_COLUMNS = re.compile(r'^SELECT .*? FROM ', re.DOTALL)
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_PLACEHOLDER_LISTS = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+
+
+def fingerprint(sql: str) -> str:
+    """
+    The statement without its column list and with literals and placeholder lists collapsed,
+    so repeated queries (e.g. N+1 lookups) group together.
+    """
+    sql = _SELECT_COLUMNS.sub('SELECT ... FROM ', sql)
+    return _PLACEHOLDER_LISTS.sub('(...)', _LITERALS.sub('?', sql))
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        # Connections opened before this module was imported didn't go through connection_created
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(sender=None, connection=connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, metrics, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, metrics, time.perf_counter() - start)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.view = view_name(view_func, request.method)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered by the handler after this hook
+        metrics = _current.get()
+        if metrics is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                metrics.render_time += time.perf_counter() - start
+            response.add_post_render_callback(rendered)
+        return response
+
+    @staticmethod
+    def _finish(request, response, metrics, latency):
+        if metrics.view is None:
+            # Unrouted requests (404s of unknown URLs) would only add noise
+            return
+        registry.record(metrics.view, request.method, response.status_code, latency, metrics)
+        if latency >= settings.SLOW_REQUEST_THRESHOLD:
+            top = Counter(map(fingerprint, metrics.queries)).most_common(5)
+            logger.warning(
+                'Slow request %s %s (%s) took %.0fms, %d queries in %.0fms, serialize %.0fms, render %.0fms. '
+                'Most frequent queries: %s',
+                request.method, request.path, metrics.view, latency * 1000, len(metrics.queries),
+                metrics.db_time * 1000, metrics.serialize_time * 1000, metrics.render_time * 1000,
+                '; '.join(f'{count}x {sql}' for sql, count in top) or '-',
+            )
+
+
+class MeasuredSerializerMixin:
+    """Adds the time spent building ``serializer.data`` to the request metrics."""
+
+    @property
+    def data(self):
+        metrics = _current.get()
+        if metrics is None:
+            return super().data
+        start = time.perf_counter()
+        try:
+            return super().data
+        finally:
+            metrics.serialize_time += time.perf_counter() - start
+
+
+class MeasuredListSerializer(MeasuredSerializerMixin, ListSerializer):
+    pass
+
+
+def metrics_view(request):
+    if request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS:
+        raise Http404
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
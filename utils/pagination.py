@@ -0,0 +1,16 @@
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the primary key, pages are fetched with ``WHERE id < <cursor>`` so they stay
+    cheap however deep the client goes and no ``COUNT(*)`` is ever issued.
+    """
+    ordering = '-id'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class CreatedAtCursorPagination(IdCursorPagination):
+    # The id only breaks ties between rows created within the same timestamp
+    ordering = ('-created_at', '-id')
@@ -0,0 +1,26 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+@contextmanager
+def temporary_database():
+    """
+    Run the block against a freshly migrated test database that is dropped afterwards, for the
+    benchmark and stress commands. SQLite gets a file instead of the default in-memory database,
+    so it can be shared by threads.
+    """
+    if connection.vendor == 'sqlite':
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(), 'temporary.sqlite3')
+
+    setup_test_environment(debug=False)
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        cache.clear()
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()